@@ -1,58 +1,234 @@
 from flask import Flask, render_template, Response, jsonify, request
 import cv2
 import time
-import json
 import os
+import threading
+
+from frame_broadcast import FrameBroadcaster
+from frame_grabber import LatestFrameGrabber
+from event_store import EventStore
+from metrics import METRICS_FILE, prometheus_from
+from layout_store import LayoutStore, import_legacy_web, normalize_zones, zones_to_pixels
+from web_state import CachedJsonFile, ChangeHub
 
 app = Flask(__name__)
 
 # Directorio de datos
 DATA_DIR = "logs"
-LAYOUT_FILE = os.path.join(DATA_DIR, "current_layout.json")
 
 if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
 
-# Estado inicial
-layout = {
-    "zones": [],
-    "objects": []
-}
+# Layout compartido con la app de escritorio (versionado, recarga en caliente)
+layout_store = LayoutStore().start()
+
+# Zonas del editor antiguo (logs/current_layout.json, en píxeles de un lienzo sin
+# tamaño guardado): se importan una vez suponiendo este tamaño de lienzo
+LEGACY_CANVAS = tuple(int(v) for v in os.environ.get("ANTINAPAS_LEGACY_CANVAS", "860x484").split("x"))
+try:
+    if import_legacy_web(layout_store, LEGACY_CANVAS):
+        print(f"🗺 Zonas del editor antiguo importadas al layout compartido (lienzo {LEGACY_CANVAS[0]}x{LEGACY_CANVAS[1]})")
+except ValueError as e:
+    raise SystemExit(f"❌ {e} (ANTINAPAS_LEGACY_CANVAS=<ancho>x<alto>)")
+metrics_cache = CachedJsonFile(METRICS_FILE, None)
+
+# Cambios de estado empujados a los paneles por Server-Sent Events
+hub = ChangeHub()
+
+# Eventos del sistema: la misma base SQLite en la que escribe la app de escritorio
+events = EventStore()
+RECENT_EVENTS = 20
+
+# Vídeo en vivo: el detector publica cada frame procesado y se codifica una vez
+CAMERA_SOURCE = os.environ.get("ANTINAPAS_CAMERA", "0")
+broadcaster = FrameBroadcaster(max_fps=15)
+eagle_eye = {"status": "SAFE", "running": False, "connected": False}
+_detector_lock = threading.Lock()
+
+
+def detection_loop():
+    """Detector del portal: visión + zonas del layout, publicado en /video_feed."""
+    grabber = None
+    try:
+        from vision_engine import AntiNapasVision
+        source = int(CAMERA_SOURCE) if CAMERA_SOURCE.isdigit() else CAMERA_SOURCE
+        grabber = LatestFrameGrabber(source).start()
+        vision = AntiNapasVision()
+        zones_key, zones = None, []
+        while True:
+            frame, _, _ = grabber.read(timeout=1.0)
+            eagle_eye["connected"] = grabber.connected
+            if frame is None:
+                continue
+            # Zonas en píxeles de la cámara: se recalculan solo si cambia el layout o el tamaño
+            layout = layout_store.get()
+            key = (layout["version"], frame.shape[:2])
+            if key != zones_key:
+                zones_key, zones = key, zones_to_pixels(layout, (frame.shape[1], frame.shape[0]))
+            frame, status = vision.process_frame(frame, zones)
+            if status != eagle_eye["status"]:
+                eagle_eye["status"] = status
+                hub.publish("status", status_summary())
+            broadcaster.publish(frame)
+    except Exception as e:
+        print(f"❌ Detector del portal detenido: {e}")
+    finally:
+        # Sin detector: /video_feed cierra sus streams y la próxima visita lo rearranca
+        eagle_eye["running"] = eagle_eye["connected"] = False
+        if grabber is not None:
+            grabber.stop()
+        hub.publish("status", status_summary())
+
+
+def detector_alive():
+    return eagle_eye["running"] and eagle_eye["connected"]
+
 
-if os.path.exists(LAYOUT_FILE):
-    with open(LAYOUT_FILE, "r") as f:
-        layout = json.load(f)
+def ensure_detector():
+    with _detector_lock:
+        if not eagle_eye["running"]:
+            eagle_eye["running"] = True
+            threading.Thread(target=detection_loop, daemon=True).start()
 
-events = [
-    {"time": "12:15:02", "zone": "Volcado", "type": "RED", "msg": "Intrusión detectada - PARO LÍNEA"},
-]
+
+def change_watcher(interval=0.5):
+    """Detecta cambios (layout en disco, detector caído/activo) y los empuja al hub."""
+    while True:
+        hub.publish("status", status_summary())
+        hub.publish("layout", layout_store.get())
+        hub.publish("events", recent_events())
+        time.sleep(interval)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def event_row(ev):
+    return {
+        "id": ev["id"],
+        "time": time.strftime("%H:%M:%S", time.localtime(ev["ts"])),
+        "zone": ev["zone"],
+        "type": ev["type"],
+        "msg": ev["message"],
+    }
+
+
+def recent_events():
+    return [event_row(ev) for ev in events.query(page_size=RECENT_EVENTS)]
+
+
+def read_metrics():
+    """Última instantánea de métricas publicada por el bucle de detección."""
+    snapshot = metrics_cache.get()
+    return dict(snapshot) if snapshot else None
+
+
+def eagle_eye_state(snapshot):
+    # El detector exporta cada segundo: si la instantánea es vieja, está caído
+    if snapshot and time.time() - snapshot.get("timestamp", 0) < 5:
+        return "ONLINE"
+    return "OFFLINE"
+
+
+@app.route('/video_feed')
+def video_feed():
+    ensure_detector()
+    sub = broadcaster.subscribe()
+    return Response(broadcaster.mjpeg_stream(sub, alive=detector_alive),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+def status_summary():
+    return {
+        "system": "ACTIVE",
+        "mode": "AUTOMATICO",
+        "eagle_eye": eagle_eye_state(read_metrics()),
+        "live_status": eagle_eye["status"] if eagle_eye["running"] else None,
+    }
+
+
 @app.route('/api/status')
 def get_status():
-    global layout
-    # Intentar recargar el layout desde el archivo central si ha cambiado
-    if os.path.exists(LAYOUT_FILE):
-        with open(LAYOUT_FILE, "r") as f:
-            layout = json.load(f)
-            
+    payload = status_summary()
+    payload.update({
+        "viewers": broadcaster.viewers,
+        "last_events": recent_events(),
+        "layout": layout_store.get()
+    })
+    # ETag: si nada ha cambiado el panel recibe un 304 sin cuerpo
+    resp = jsonify(payload)
+    resp.add_etag()
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
+@app.route('/api/stream')
+def status_stream():
+    """Server-Sent Events: estado, layout y eventos solo cuando cambian."""
+    since = hub.parse_event_id(request.headers.get("Last-Event-ID"))
+    return Response(hub.sse_stream(since), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/events')
+def get_events():
+    """Eventos paginados: ?page=1&page_size=50&type=DANGER&zone=ROJA&since=<epoch>&until=<epoch>"""
+    args = request.args
+    filters = {
+        "event_type": args.get("type"),
+        "zone": args.get("zone"),
+        "since": args.get("since", type=float),
+        "until": args.get("until", type=float),
+    }
+    page = max(1, args.get("page", 1, type=int))
+    page_size = min(500, max(1, args.get("page_size", 50, type=int)))
     return jsonify({
-        "system": "ACTIVE",
-        "mode": "AUTOMATICO",
-        "eagle_eye": "ONLINE",
-        "last_events": events,
-        "layout": layout
+        "page": page,
+        "page_size": page_size,
+        "total": events.count(**filters),
+        "events": [event_row(ev) for ev in events.query(page, page_size, **filters)],
     })
 
+
+@app.route('/api/metrics')
+def get_metrics():
+    snapshot = read_metrics()
+    if request.args.get("format") == "prometheus":
+        return prometheus_metrics()
+    if snapshot is None:
+        return jsonify({"eagle_eye": "OFFLINE", "stages": {}, "counters": {}, "gauges": {}})
+    snapshot.pop("buckets", None)
+    snapshot.pop("sums", None)
+    snapshot["eagle_eye"] = eagle_eye_state(snapshot)
+    return jsonify(snapshot)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    snapshot = read_metrics() or {}
+    buckets, sums = snapshot.get("buckets", {}), snapshot.get("sums", {})
+    text = prometheus_from("antinapas", {
+        "histograms": {k: (b, sum(b), sums.get(k, 0.0)) for k, b in buckets.items()},
+        "counters": snapshot.get("counters", {}),
+        "gauges": snapshot.get("gauges", {}),
+    })
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/api/layout', methods=['POST'])
 def save_layout():
-    global layout
-    layout = request.json
-    with open(LAYOUT_FILE, "w") as f:
-        json.dump(layout, f)
-    return jsonify({"status": "success"})
+    body = request.json
+    # El editor envía píxeles de su lienzo: se guardan normalizados (0..1)
+    size = body.get("size")
+    if not size or not size.get("w") or not size.get("h"):
+        return jsonify({"status": "error", "error": "Falta el tamaño del lienzo (size.w / size.h)"}), 400
+    changes = {"zones": normalize_zones(body.get("zones", []), (size["w"], size["h"]))}
+    if "objects" in body:
+        changes["objects"] = body["objects"]
+    version = layout_store.update(changes, "web")
+    hub.publish("layout", layout_store.get())
+    return jsonify({"status": "success", "version": version})
+
+
+threading.Thread(target=change_watcher, daemon=True).start()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8080)
+    app.run(debug=True, port=8080, threaded=True)
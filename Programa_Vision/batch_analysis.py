@@ -0,0 +1,175 @@
+# =============================================================================
+# AntiÑapas-Pons: Análisis por lotes de grabaciones (sin interfaz)
+# Desc.  : Pasa vídeos grabados (captures/GRABACION_*.avi, vídeo de planta...)
+#          por el mismo pipeline de movimiento, zonas y anonimización que el
+#          modo en vivo, repartiendo ficheros y tramos de tiempo entre todos
+#          los núcleos. Genera estado por frame, impactos de zona y un
+#          resumen de rendimiento (frames/s por núcleo).
+#
+# Uso    : python batch_analysis.py "captures/GRABACION_*.avi" --workers 8
+# =============================================================================
+
+import argparse
+import csv
+import datetime
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from bg_models import DEFAULT_BACKEND, LearningSchedule
+from face_tracker import FaceAnonymizer
+from layout_store import LAYOUT_FILE, read_layout, rects_from_layout
+from motion_pipeline import MotionPipeline
+from zone_raster import LABEL_AMBER, LABEL_RED
+
+FRAME_SIZE = (860, 484)
+CSV_HEADER = ["file", "frame", "time_s", "status", "motion", "red_hits", "amber_hits", "faces"]
+
+
+def plan_chunks(paths, chunk_seconds):
+    """Divide cada vídeo en tramos [inicio, fin) de frames."""
+    chunks = []
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+        cap.release()
+        if total <= 0:
+            # Contenedor sin índice de frames: se procesa entero en un solo tramo
+            chunks.append((path, 0, None, fps))
+            continue
+        step = max(1, int(chunk_seconds * fps)) if chunk_seconds else total
+        for start in range(0, total, step):
+            chunks.append((path, start, min(total, start + step), fps))
+    return chunks
+
+
+def analyze_chunk(path, start, end, fps, settings, warmup, faces=True):
+    """Procesa un tramo de un vídeo. Se ejecuta en un proceso de trabajo."""
+    cv2.setNumThreads(1)  # un núcleo por proceso: sin sobresuscripción
+    pipeline = MotionPipeline(settings.get("roi"), settings.get("red_zones"), settings.get("amber_zones"),
+                              crop_to_roi=settings.get("motion_crop_roi", True),
+                              scale=settings.get("motion_scale", 1.0),
+                              backend=settings.get("motion_backend", DEFAULT_BACKEND),
+                              backend_params=settings.get("motion_backend_params"),
+                              schedule=LearningSchedule(settings.get("motion_learning_rates")))
+    anonymizer = None
+    if faces:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        anonymizer = FaceAnonymizer(cascade, 1.2, 6, min_size=(60, 60))
+
+    cap = cv2.VideoCapture(path)
+    # Se arranca `warmup` frames antes para que el modelo de fondo llegue entrenado
+    first = max(0, start - warmup)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    calib = warmup if start == 0 else start - first
+
+    rows = []
+    idx = first
+    t0 = time.process_time()
+    while end is None or idx < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(frame, FRAME_SIZE)
+        n_faces = len(anonymizer.update(frame, fg_mask=pipeline.fg_mask, roi=pipeline.roi_zone)) if anonymizer else 0
+        if idx - first < calib:
+            pipeline.learn(frame)
+            status, rects = "CALIBRACION", []
+            red = amber = 0
+        else:
+            status, rects = pipeline.process(frame)
+            labels = pipeline.last_labels
+            red = int((labels == LABEL_RED).sum())
+            amber = int((labels == LABEL_AMBER).sum())
+        if idx >= start:
+            rows.append([os.path.basename(path), idx, round(idx / fps, 3), status, len(rects), red, amber, n_faces])
+        idx += 1
+    cap.release()
+    return rows, time.process_time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis por lotes de grabaciones con el pipeline AntiÑapas.")
+    parser.add_argument("inputs", nargs="+", help="Vídeos o patrones glob (AVI/MP4)")
+    parser.add_argument("--settings", default="logs/factory_settings.json", help="Parámetros de movimiento")
+    parser.add_argument("--layout", default=LAYOUT_FILE, help="Layout compartido con el ROI y las zonas")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de trabajo")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="Duración de cada tramo (0 = fichero entero)")
+    parser.add_argument("--warmup", type=int, default=60, help="Frames de calibración antes de cada tramo")
+    parser.add_argument("--no-faces", action="store_true", help="Omitir la anonimización")
+    parser.add_argument("--out", default=None, help="Carpeta de salida (por defecto logs/batch_<fecha>)")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    if not paths:
+        print("No se encontraron vídeos.")
+        return 1
+    settings = {}
+    if os.path.exists(args.settings):
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    if not settings.get("roi"):
+        # Las zonas viven en el layout compartido (las configuraciones antiguas las traían dentro)
+        roi, red, amber = rects_from_layout(read_layout(args.layout), FRAME_SIZE)
+        settings.update(roi=roi, red_zones=red, amber_zones=amber)
+    if not settings.get("roi"):
+        print(f"⚠ Sin ROI en {args.layout}: no hay zonas, todo será SAFE.")
+
+    out_dir = args.out or os.path.join("logs", f"batch_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = plan_chunks(paths, args.chunk_seconds)
+    print(f"{len(paths)} vídeos → {len(chunks)} tramos en {args.workers} procesos")
+
+    totals = {"frames": 0, "DANGER": 0, "WARNING": 0, "cpu_s": 0.0}
+    incidents = []
+    t_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, \
+            open(os.path.join(out_dir, "frames.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        futures = [pool.submit(analyze_chunk, path, start, end, fps, settings, args.warmup, not args.no_faces)
+                   for path, start, end, fps in chunks]
+        prev = {}  # último estado por fichero, para detectar entradas en DANGER
+        for fut in futures:  # en orden: el CSV sale ordenado por fichero y frame
+            rows, cpu_s = fut.result()
+            writer.writerows(rows)
+            totals["cpu_s"] += cpu_s
+            for row in rows:
+                name, status = row[0], row[3]
+                totals["frames"] += 1
+                if status in ("DANGER", "WARNING"):
+                    totals[status] += 1
+                if status == "DANGER" and prev.get(name) != "DANGER":
+                    incidents.append({"file": name, "frame": row[1], "time_s": row[2]})
+                prev[name] = status
+    wall = time.perf_counter() - t_start
+
+    summary = {
+        "videos": len(paths),
+        "chunks": len(chunks),
+        "workers": args.workers,
+        "frames": totals["frames"],
+        "danger_frames": totals["DANGER"],
+        "warning_frames": totals["WARNING"],
+        "incidents": incidents,
+        "wall_s": round(wall, 3),
+        "fps_total": round(totals["frames"] / wall, 1) if wall else 0.0,
+        "fps_per_core": round(totals["frames"] / totals["cpu_s"], 1) if totals["cpu_s"] else 0.0,
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"✅ {summary['frames']} frames en {summary['wall_s']}s → {summary['fps_total']} fps "
+          f"({summary['fps_per_core']} fps/núcleo) | {len(incidents)} intrusiones | resultados en {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# =============================================================================
+# AntiÑapas-Pons: Selección del modelo de fondo por puesto
+# Desc.  : Reproduce grabaciones del puesto con todos los modelos de fondo
+#          (bg_models) en paralelo, frame a frame, y compara cada uno con la
+#          referencia (MOG2 con sombras): CPU por frame, concordancia de
+#          estado, recall de DANGER, falsos DANGER e IoU de la máscara de
+#          movimiento. Recomienda el más barato que cumpla la concordancia
+#          y el IoU mínimos y muestra las claves de configuración que tocan.
+#
+# Uso    : python bench_motion_backends.py captures/2026/*/*/GRABACION_*.avi
+#          python bench_motion_backends.py --out logs/bench_backends.json   (sintético)
+# =============================================================================
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bench_pipeline import clip_frames, synthetic_frames
+from bg_models import LearningSchedule
+from layout_store import LAYOUT_FILE
+from motion_pipeline import MotionPipeline
+from verify_motion_pipeline import FRAME_SIZE, load_zones
+
+REFERENCE = "mog2"
+
+# Candidatos: nombre → (backend, parámetros)
+CANDIDATES = {
+    "mog2": ("mog2", {}),
+    "mog2_sin_sombras": ("mog2", {"detect_shadows": False}),
+    "knn": ("knn", {}),
+    "knn_sin_sombras": ("knn", {"detect_shadows": False}),
+    "running_avg": ("running_avg", {}),
+    "frame_diff": ("frame_diff", {}),
+}
+
+
+def mask_iou(a, b):
+    """IoU de dos máscaras binarias; None si ambas están vacías."""
+    inter = cv2.countNonZero(cv2.bitwise_and(a, b))
+    union = cv2.countNonZero(cv2.bitwise_or(a, b))
+    return inter / union if union else None
+
+
+def compare_frames(frames, roi, red, amber, names, scale=1.0, rates=None, warmup=30):
+    """Todos los modelos sobre los mismos frames; resultados por candidato."""
+    pipes = {}
+    for name in names:
+        backend, params = CANDIDATES[name]
+        pipes[name] = MotionPipeline(roi, red, amber, crop_to_roi=True, scale=scale, backend=backend,
+                                     backend_params=params, schedule=LearningSchedule(rates))
+    stats = {name: {"frames": 0, "cpu_s": 0.0, "wall_s": 0.0, "agree": 0, "danger_both": 0,
+                    "danger_extra": 0, "iou": []} for name in names}
+    danger_ref = 0
+    for idx, frame in enumerate(frames):
+        if idx < warmup:
+            # Misma calibración inicial para todos los modelos
+            for pipe in pipes.values():
+                pipe.learn(frame)
+            continue
+        out = {}
+        for name, pipe in pipes.items():
+            c0, t0 = time.process_time(), time.perf_counter()
+            status, _ = pipe.process(frame)
+            s = stats[name]
+            s["cpu_s"] += time.process_time() - c0
+            s["wall_s"] += time.perf_counter() - t0
+            out[name] = (status, pipe.fg_mask.copy())
+        ref_status, ref_mask = out[REFERENCE]
+        danger_ref += ref_status == "DANGER"
+        for name, (status, mask) in out.items():
+            s = stats[name]
+            s["frames"] += 1
+            s["agree"] += status == ref_status
+            s["danger_both"] += status == "DANGER" and ref_status == "DANGER"
+            s["danger_extra"] += status == "DANGER" and ref_status != "DANGER"
+            iou = mask_iou(mask, ref_mask)
+            if iou is not None:
+                s["iou"].append(iou)
+    return stats, danger_ref
+
+
+def summarize(stats, danger_ref):
+    out = {}
+    for name, s in stats.items():
+        n = s["frames"]
+        out[name] = {
+            "frames": n,
+            "cpu_ms": round(s["cpu_s"] / n * 1000, 3) if n else 0.0,
+            "wall_ms": round(s["wall_s"] / n * 1000, 3) if n else 0.0,
+            "status_agreement": round(s["agree"] / n, 4) if n else 1.0,
+            "danger_recall": round(s["danger_both"] / danger_ref, 4) if danger_ref else 1.0,
+            "false_danger": s["danger_extra"],
+            "mask_iou": round(float(np.mean(s["iou"])), 4) if s["iou"] else 1.0,
+        }
+    return out
+
+
+def merge_stats(total, stats):
+    for name, s in stats.items():
+        t = total.setdefault(name, {"frames": 0, "cpu_s": 0.0, "wall_s": 0.0, "agree": 0, "danger_both": 0,
+                                    "danger_extra": 0, "iou": []})
+        for key in ("frames", "cpu_s", "wall_s", "agree", "danger_both", "danger_extra"):
+            t[key] += s[key]
+        t["iou"] += s["iou"]
+
+
+def print_report(title, report):
+    print(f"\n── {title} ──")
+    print(f"{'modelo':<18}{'CPU ms':>9}{'estado':>9}{'DANGER':>9}{'falsos':>8}{'IoU':>7}")
+    for name, r in sorted(report.items(), key=lambda kv: kv[1]["cpu_ms"]):
+        print(f"{name:<18}{r['cpu_ms']:>9.2f}{r['status_agreement']:>9.2%}{r['danger_recall']:>9.2%}"
+              f"{r['false_danger']:>8}{r['mask_iou']:>7.2f}")
+
+
+def pick(report, min_agreement, min_iou):
+    """El candidato más barato que iguala a la referencia en estado, DANGER y máscara."""
+    ok = [name for name, r in report.items()
+          if r["status_agreement"] >= min_agreement and r["danger_recall"] >= min_agreement
+          and r["mask_iou"] >= min_iou]
+    return min(ok, key=lambda name: report[name]["cpu_ms"]) if ok else REFERENCE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los modelos de fondo en grabaciones del puesto.")
+    parser.add_argument("clips", nargs="*", help="Vídeos grabados (sin vídeos: escena sintética)")
+    parser.add_argument("--backends", nargs="+", default=list(CANDIDATES), choices=list(CANDIDATES))
+    parser.add_argument("--layout", default=LAYOUT_FILE, help="Layout compartido con el ROI y las zonas")
+    parser.add_argument("--settings", default="logs/factory_settings.json",
+                        help="Configuración (zonas antiguas y motion_learning_rates)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Escala del modelo de fondo")
+    parser.add_argument("--frames", type=int, default=600, help="Máximo de frames por vídeo")
+    parser.add_argument("--warmup", type=int, default=30, help="Frames de calibración")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Concordancia mínima exigida")
+    parser.add_argument("--min-iou", type=float, default=0.5, help="IoU medio mínimo de la máscara de movimiento")
+    parser.add_argument("--out", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)  # coste comparable entre modelos y máquinas
+    names = [REFERENCE] + [n for n in args.backends if n != REFERENCE]
+    roi, red, amber = load_zones(args.settings, args.layout)
+    rates = None
+    try:
+        with open(args.settings, "r") as f:
+            rates = json.load(f).get("motion_learning_rates")
+    except (OSError, ValueError):
+        pass
+    if not roi:
+        print("⚠ Sin ROI: se usa el frame completo y el estado será siempre SAFE (solo cuentan CPU e IoU).")
+        roi = (0, 0) + FRAME_SIZE
+
+    cases = {clip: clip_frames(clip, args.frames) for clip in args.clips}
+    if not cases:
+        cases["sintético"] = synthetic_frames(FRAME_SIZE, min(args.frames, 300))
+
+    total, danger_total, results = {}, 0, {}
+    for name, frames in cases.items():
+        frames = [cv2.resize(f, FRAME_SIZE) for f in frames]
+        if len(frames) <= args.warmup:
+            print(f"⚠ {name}: muy corto ({len(frames)} frames)")
+            continue
+        stats, danger_ref = compare_frames(frames, roi, red, amber, names, args.scale, rates, args.warmup)
+        results[name] = summarize(stats, danger_ref)
+        print_report(name, results[name])
+        merge_stats(total, stats)
+        danger_total += danger_ref
+
+    if not total:
+        return 1
+    overall = summarize(total, danger_total)
+    if len(results) > 1:
+        print_report("TOTAL", overall)
+    best = pick(overall, args.min_agreement, args.min_iou)
+    backend, params = CANDIDATES[best]
+    print(f"\n✅ Recomendado: {best} ({overall[best]['cpu_ms']:.2f} ms vs "
+          f"{overall[REFERENCE]['cpu_ms']:.2f} ms de {REFERENCE})")
+    print(f'   "motion_backend": "{backend}", "motion_backend_params": {json.dumps(params)}')
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "machine": platform.node(),
+                "cpu": platform.processor() or platform.machine(),
+                "opencv": cv2.__version__,
+                "reference": REFERENCE,
+                "recommended": best,
+                "clips": results,
+                "total": overall,
+            }, f, indent=2)
+        print(f"💾 Resultados guardados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# =============================================================================
+# AntiÑapas-Pons: Micro-benchmark por etapa del bucle de visión
+# Desc.  : Mide cada etapa del camino caliente de update_video y de
+#          AntiNapasVision.process_frame (resize, anonimización, movimiento,
+#          HUD, vista previa) con frames sintéticos o grabados a varias
+#          resoluciones. Usa las mismas clases que la app (FaceAnonymizer,
+#          MotionPipeline, HudOverlay, PreviewDisplay) con las zonas del
+#          layout y los ajustes de movimiento de la configuración (recorte,
+#          escala, modelo de fondo). Da p50/p95/p99 por etapa y guarda JSON
+#          comparable entre ejecuciones.
+#
+# Uso    : python bench_pipeline.py --out logs/bench_base.json
+#          python bench_pipeline.py --clips captures/GRABACION_1.avi --compare logs/bench_base.json
+# =============================================================================
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bg_models import DEFAULT_BACKEND, LearningSchedule
+from face_tracker import FaceAnonymizer
+from hud_overlay import HudOverlay
+from layout_store import LAYOUT_FILE, read_layout, rects_from_layout
+from motion_pipeline import MotionPipeline
+
+DISPLAY_SIZE = (860, 484)
+DEFAULT_ZONES = ((100, 60, 760, 440), [(450, 80, 740, 420)], [(120, 80, 440, 420)])
+RESOLUTIONS = {"360p": (640, 360), "484p": (860, 484), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def synthetic_frames(size, n):
+    """Fondo con ruido y un bloque que cruza la escena (simula un operario)."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    bg = rng.integers(40, 140, (h, w, 3), dtype=np.uint8)
+    frames = []
+    for i in range(n):
+        f = bg.copy()
+        x = int((i * 7) % max(1, w - w // 8))
+        cv2.rectangle(f, (x, h // 3), (x + w // 12, h // 3 + h // 3), (230, 230, 230), -1)
+        frames.append(f)
+    return frames
+
+
+def clip_frames(path, n):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        self.samples.setdefault(name, []).append((time.perf_counter() - t0) * 1000)
+        return out
+
+    def report(self):
+        out = {}
+        for name, vals in self.samples.items():
+            a = np.asarray(vals)
+            out[name] = {
+                "n": len(a),
+                "mean_ms": round(float(a.mean()), 4),
+                "p50_ms": round(float(np.percentile(a, 50)), 4),
+                "p95_ms": round(float(np.percentile(a, 95)), 4),
+                "p99_ms": round(float(np.percentile(a, 99)), 4),
+            }
+        return out
+
+
+def load_config(settings_path, layout_path):
+    """Zonas del layout compartido y parámetros de movimiento de la configuración,
+    como los usa la app (sin layout: zonas de ejemplo)."""
+    settings = {}
+    if os.path.exists(settings_path):
+        with open(settings_path, "r") as f:
+            settings = json.load(f)
+    roi, red, amber = rects_from_layout(read_layout(layout_path), DISPLAY_SIZE)
+    if not roi:
+        roi, red, amber = settings.get("roi") or DEFAULT_ZONES[0], DEFAULT_ZONES[1], DEFAULT_ZONES[2]
+    return dict(settings, roi=tuple(roi), red_zones=red, amber_zones=amber)
+
+
+def _display_factory():
+    """PreviewDisplay real sobre un canvas oculto, si hay Tk y pantalla."""
+    try:
+        import tkinter as tk
+        from preview_display import PreviewDisplay
+        root = tk.Tk()
+        root.withdraw()
+        canvas = tk.Canvas(root, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1])
+        return PreviewDisplay(canvas, canvas.create_image(0, 0, anchor="nw")), root
+    except Exception:
+        return None, None
+
+
+def bench_desktop(frames, timer, display, cfg, warmup=30):
+    """Etapas de AntiNapasApp.update_video con las mismas clases y ajustes que la app."""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    anonymizer = FaceAnonymizer(cascade, 1.2, 6, min_size=(60, 60))
+    motion = MotionPipeline(cfg["roi"], cfg["red_zones"], cfg["amber_zones"],
+                            crop_to_roi=cfg.get("motion_crop_roi", True), scale=cfg.get("motion_scale", 1.0),
+                            backend=cfg.get("motion_backend", DEFAULT_BACKEND),
+                            backend_params=cfg.get("motion_backend_params"),
+                            schedule=LearningSchedule(cfg.get("motion_learning_rates")))
+    hud = HudOverlay(DISPLAY_SIZE)
+    roi, red, amber = cfg["roi"], cfg["red_zones"], cfg["amber_zones"]
+
+    for idx, raw in enumerate(frames):
+        frame = timer.run("resize", cv2.resize, raw, DISPLAY_SIZE)
+        timer.run("anonymize", anonymizer.update, frame, fg_mask=motion.fg_mask, roi=roi)
+        if idx < warmup:
+            timer.run("motion_learn", motion.learn, frame)  # calibración antes de vigilar
+            continue
+        _, rects = timer.run("motion", motion.process, frame)
+        timer.run("hud", hud.draw, frame, True, roi, red, amber, rects, "AUTOMATICO", False,
+                  "LAT 0ms  DROP 0  LVL 0  MISS 0")
+        if display:
+            timer.run("preview", display.paint, frame)
+        else:
+            timer.run("cvt_rgb", cv2.cvtColor, frame, cv2.COLOR_BGR2RGB)
+
+
+def bench_engine(frames, timer):
+    """AntiNapasVision.process_frame completo (requiere mediapipe)."""
+    try:
+        from vision_engine import AntiNapasVision
+    except Exception as e:
+        print(f"  (vision_engine no disponible: {e})")
+        return
+    vision = AntiNapasVision()
+    zones = [{'type': 'RED', 'points': [(100, 100), (400, 100), (400, 400), (100, 400)]}]
+    for raw in frames:
+        timer.run("engine_process_frame", vision.process_frame, raw.copy(), zones)
+
+
+def print_report(name, report, base=None):
+    print(f"\n── {name} ──")
+    print(f"{'etapa':<22}{'p50':>9}{'p95':>9}{'p99':>9}   Δp50")
+    for stage, r in report.items():
+        delta = ""
+        if base and stage in base:
+            b = base[stage]["p50_ms"]
+            delta = f"{(r['p50_ms'] - b) / b * 100:+.1f}%" if b else ""
+        print(f"{stage:<22}{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{r['p99_ms']:>9.3f}   {delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark por etapa del bucle de visión.")
+    parser.add_argument("--frames", type=int, default=200, help="Frames por caso")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--clips", nargs="*", default=[], help="Vídeos grabados a medir además de los sintéticos")
+    parser.add_argument("--engine", action="store_true", help="Medir también AntiNapasVision.process_frame")
+    parser.add_argument("--settings", default="logs/factory_settings.json", help="Ajustes de movimiento de la app")
+    parser.add_argument("--layout", default=LAYOUT_FILE, help="Layout compartido con el ROI y las zonas")
+    parser.add_argument("--out", help="Guardar resultados en JSON")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar p50")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)  # resultados estables y comparables entre máquinas
+    display, root = _display_factory()
+    cfg = load_config(args.settings, args.layout)
+    base = {}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            base = json.load(f).get("cases", {})
+
+    cases = {f"synthetic_{r}": synthetic_frames(RESOLUTIONS[r], args.frames) for r in args.resolutions}
+    for clip in args.clips:
+        cases[f"clip_{clip}"] = clip_frames(clip, args.frames)
+
+    results = {}
+    for name, frames in cases.items():
+        if not frames:
+            print(f"⚠ {name}: sin frames")
+            continue
+        timer = StageTimer()
+        bench_desktop(frames, timer, display, cfg)
+        if args.engine:
+            bench_engine(frames, timer)
+        results[name] = timer.report()
+        print_report(name, results[name], base.get(name))
+
+    if root:
+        root.destroy()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "machine": platform.node(),
+                "cpu": platform.processor() or platform.machine(),
+                "opencv": cv2.__version__,
+                "frames": args.frames,
+                "motion": {k: cfg.get(k) for k in ("motion_crop_roi", "motion_scale", "motion_backend",
+                                                   "motion_backend_params", "motion_learning_rates")},
+                "cases": results,
+            }, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
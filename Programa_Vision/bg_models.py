@@ -0,0 +1,131 @@
+# =============================================================================
+# AntiÑapas-Pons: Modelos de fondo intercambiables
+# Desc.  : Todos los sustractores exponen apply(frame, learning_rate) y
+#          devuelven una máscara uint8 en la que 255 = primer plano (las
+#          sombras de MOG2/KNN quedan en 127 y el umbral del pipeline las
+#          descarta). Así cada puesto puede usar el más barato que le baste:
+#              mog2         → OpenCV MOG2 (referencia, el de siempre)
+#              knn          → OpenCV KNN
+#              running_avg  → media móvil en gris (float32) + diferencia
+#              frame_diff   → diferencia con el frame anterior
+#          El ritmo de aprendizaje lo decide LearningSchedule según el modo
+#          de vigilancia y los frames desde la última calibración.
+# =============================================================================
+
+import cv2
+import numpy as np
+
+DEFAULT_BACKEND = "mog2"
+
+# Ritmos por modo de vigilancia (-1 = automático del modelo). Fuera de
+# CALIBRACION/AUTOMATICO se aprende despacio: en EMERGENCIA el intruso no
+# debe pasar a formar parte del fondo
+DEFAULT_RATES = {"CALIBRACION": -1, "AUTOMATICO": -1, "STOP": 0.005, "EMERGENCIA": 0.005}
+
+
+class OpenCvSubtractor:
+    """MOG2 o KNN de OpenCV (con detección de sombras opcional)."""
+
+    def __init__(self, kind="mog2", history=500, threshold=None, detect_shadows=True):
+        if kind == "mog2":
+            self.model = cv2.createBackgroundSubtractorMOG2(
+                history=history, varThreshold=50 if threshold is None else threshold, detectShadows=detect_shadows)
+        else:
+            self.model = cv2.createBackgroundSubtractorKNN(
+                history=history, dist2Threshold=400 if threshold is None else threshold, detectShadows=detect_shadows)
+
+    def apply(self, frame, learning_rate=-1):
+        return self.model.apply(frame, learningRate=learning_rate)
+
+
+class RunningAverage:
+    """Fondo = media móvil exponencial del frame en gris.
+
+    Con ritmo -1 se comporta como MOG2: media acumulada (1/n) durante los
+    primeros `history` frames y después `alpha` fijo.
+    """
+
+    def __init__(self, alpha=0.01, threshold=25, history=100, blur=5):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.history = history
+        self.blur = blur
+        self.background = None
+        self.frames = 0
+
+    def _gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.blur > 1:
+            gray = cv2.blur(gray, (self.blur, self.blur))
+        return gray
+
+    def apply(self, frame, learning_rate=-1):
+        gray = self._gray(frame)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.frames = 1
+            return np.zeros(gray.shape, np.uint8)
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        self.frames += 1
+        if learning_rate < 0:
+            learning_rate = max(self.alpha, 1.0 / min(self.frames, self.history))
+        if learning_rate > 0:
+            cv2.accumulateWeighted(gray, self.background, learning_rate)
+        return mask
+
+
+class FrameDifference:
+    """Diferencia con el frame anterior: lo más barato, pero solo ve lo que
+    se mueve (una persona quieta dentro de la zona deja de detectarse).
+    No tiene modelo, así que el ritmo de aprendizaje se ignora."""
+
+    def __init__(self, threshold=25, blur=5):
+        self.threshold = threshold
+        self.blur = blur
+        self.previous = None
+
+    def apply(self, frame, learning_rate=-1):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.blur > 1:
+            gray = cv2.blur(gray, (self.blur, self.blur))
+        previous, self.previous = self.previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return np.zeros(gray.shape, np.uint8)
+        _, mask = cv2.threshold(cv2.absdiff(gray, previous), self.threshold, 255, cv2.THRESH_BINARY)
+        return mask
+
+
+BACKENDS = {
+    "mog2": lambda **kw: OpenCvSubtractor("mog2", **kw),
+    "knn": lambda **kw: OpenCvSubtractor("knn", **kw),
+    "running_avg": RunningAverage,
+    "frame_diff": FrameDifference,
+}
+
+
+def create_backend(name=DEFAULT_BACKEND, **params):
+    """Instancia el modelo `name` con sus parámetros (los de la configuración)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Modelo de fondo desconocido: {name} (disponibles: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**params)
+
+
+class LearningSchedule:
+    """Ritmo de aprendizaje por modo de vigilancia.
+
+    `rates` sustituye a DEFAULT_RATES modo a modo; un modo sin ritmo propio
+    usa el de STOP. Durante los `warmup_frames` posteriores a un reinicio
+    del fondo se usa `warmup_rate` (p.ej. -1 para que el modelo se forme
+    deprisa aunque el modo AUTOMATICO tenga un ritmo muy bajo).
+    """
+
+    def __init__(self, rates=None, warmup_frames=0, warmup_rate=-1):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.warmup_frames = warmup_frames
+        self.warmup_rate = warmup_rate
+
+    def rate(self, mode, frames_since_reset):
+        if frames_since_reset < self.warmup_frames:
+            return self.warmup_rate
+        return self.rates.get(mode, self.rates["STOP"])
@@ -0,0 +1,287 @@
+# =============================================================================
+# AntiÑapas-Pons: Almacén indexado de capturas con retención
+# Desc.  : Fotos y clips se guardan en carpetas por fecha
+#          (captures/AAAA/MM/DD/) y cada fichero tiene su fila en un índice
+#          SQLite (hora, zona, estado, veredicto del operador, tamaño). Las
+#          búsquedas por rango de tiempo van al índice, nunca al directorio.
+#          Un hilo de fondo aplica las cuotas de antigüedad y de disco,
+#          borrando primero los clips sin confirmar, luego las fotos sin
+#          confirmar y, solo si aún no basta, lo confirmado más antiguo.
+#          Las capturas anteriores al índice se importan como confirmadas y
+#          no caducan por antigüedad (antes se guardaban para siempre).
+# =============================================================================
+
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from thumb_cache import IMAGE_EXTS, thumb_path
+
+CAPTURES_DB = "logs/captures.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    path    TEXT PRIMARY KEY,
+    ts      REAL NOT NULL,
+    kind    TEXT NOT NULL,          -- 'snapshot' | 'clip'
+    zone    TEXT,
+    status  TEXT,
+    verdict TEXT,                   -- NULL (sin revisar) | 'confirmed' | 'false'
+    size    INTEGER,                -- NULL mientras se escribe
+    imported INTEGER NOT NULL DEFAULT 0  -- 1 = anterior al índice: sin caducidad por antigüedad
+);
+CREATE INDEX IF NOT EXISTS idx_captures_ts ON captures(ts);
+CREATE INDEX IF NOT EXISTS idx_captures_retention ON captures(verdict, kind, ts);
+"""
+
+# Una captura sin tamaño tras este tiempo no se terminó de escribir (cierre o fallo)
+UNWRITTEN_GRACE_S = 3600
+
+# Orden de borrado cuando se supera la cuota de disco
+EVICTION_ORDER = [
+    "verdict IS NOT 'confirmed' AND kind = 'clip'",
+    "verdict IS NOT 'confirmed'",
+    "1",
+]
+
+
+class CaptureStore:
+    """Rutas por fecha, índice SQLite y cuotas de antigüedad / tamaño."""
+
+    def __init__(self, root="captures", db_path=CAPTURES_DB, max_age_days=30, confirmed_max_age_days=365,
+                 max_gb=20.0, check_interval=300, on_event=None):
+        self.root = root
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self.confirmed_max_age_days = confirmed_max_age_days
+        self.max_bytes = int(max_gb * 1024 ** 3)
+        self.check_interval = check_interval
+        self.on_event = on_event
+        self._q = queue.Queue()
+        self._thread = None
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if "imported" not in [row[1] for row in conn.execute("PRAGMA table_info(captures)")]:
+            conn.execute("ALTER TABLE captures ADD COLUMN imported INTEGER NOT NULL DEFAULT 0")
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _log(self, msg):
+        if self.on_event:
+            self.on_event(msg)
+
+    # ───────────────────────── API (cualquier hilo) ──────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=5.0):
+        self._q.put(("quit",))
+        if self._thread:
+            self._thread.join(timeout)
+
+    def new_capture(self, ts=None, zone=None, status=None):
+        """Rutas (foto, clip) en la carpeta del día; quedan registradas en el índice."""
+        ts = time.time() if ts is None else ts
+        day = datetime.datetime.fromtimestamp(ts)
+        folder = os.path.join(self.root, day.strftime("%Y"), day.strftime("%m"), day.strftime("%d"))
+        os.makedirs(folder, exist_ok=True)
+        stamp = int(ts)
+        snapshot = os.path.join(folder, f"EMERGENCIA_{stamp}.jpg")
+        clip = os.path.join(folder, f"GRABACION_{stamp}.avi")
+        self._q.put(("add", [(snapshot, ts, "snapshot", zone, status), (clip, ts, "clip", zone, status)]))
+        return snapshot, clip
+
+    def mark_written(self, path):
+        """El fichero está completo en disco (llamado por CaptureWriter)."""
+        self._q.put(("written", path))
+
+    def set_verdict(self, paths, verdict):
+        """'confirmed' o 'false'. Las falsas alarmas se borran en cuanto están completas."""
+        self._q.put(("verdict", [p for p in paths if p], verdict))
+
+    def query(self, since=None, until=None, kind=None, verdict=None, limit=None, newest_first=True):
+        """Filas (path, ts, kind, zone, status, verdict, size) por rango de tiempo (índice)."""
+        clauses, args = ["size IS NOT NULL"], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        if kind:
+            clauses.append("kind = ?")
+            args.append(kind)
+        if verdict:
+            clauses.append("verdict = ?")
+            args.append(verdict)
+        sql = ("SELECT path, ts, kind, zone, status, verdict, size FROM captures WHERE "
+               + " AND ".join(clauses) + f" ORDER BY ts {'DESC' if newest_first else 'ASC'}")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        conn = self._connect()
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+    def snapshot_paths(self):
+        """Fotos indexadas, más recientes primero (para el visor)."""
+        return [row[0] for row in self.query(kind="snapshot")]
+
+    def total_bytes(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM captures").fetchone()[0]
+        finally:
+            conn.close()
+
+    # ─────────────────────────── HILO DE FONDO ───────────────────────────────
+
+    def _run(self):
+        conn = self._connect()
+        self._import_existing(conn)
+        # Primera pasada de retención tras un intervalo, no nada más arrancar
+        next_check = time.monotonic() + self.check_interval
+        while True:
+            try:
+                job = self._q.get(timeout=max(0.0, next_check - time.monotonic()))
+            except queue.Empty:
+                job = ("retention",)
+            kind = job[0]
+            try:
+                if kind == "quit":
+                    break
+                elif kind == "add":
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO captures (path, ts, kind, zone, status) VALUES (?, ?, ?, ?, ?)",
+                            job[1])
+                elif kind == "written":
+                    self._on_written(conn, job[1])
+                elif kind == "verdict":
+                    self._on_verdict(conn, job[1], job[2])
+                elif kind == "retention":
+                    self.enforce_quotas(conn)
+                    next_check = time.monotonic() + self.check_interval
+            except Exception as e:
+                self._log(f"❌ Almacén de capturas ({kind}): {e}")
+        conn.close()
+
+    def _on_written(self, conn, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with conn:
+            conn.execute("UPDATE captures SET size = ? WHERE path = ?", (size, path))
+        row = conn.execute("SELECT verdict FROM captures WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == "false":
+            self._delete(conn, [path])
+
+    def _on_verdict(self, conn, paths, verdict):
+        with conn:
+            conn.executemany("UPDATE captures SET verdict = ? WHERE path = ?", [(verdict, p) for p in paths])
+        if verdict == "false" and paths:
+            done = conn.execute(
+                f"SELECT path FROM captures WHERE size IS NOT NULL AND path IN ({','.join('?' * len(paths))})",
+                paths).fetchall()
+            self._delete(conn, [r[0] for r in done])
+
+    def _delete(self, conn, paths):
+        for path in paths:
+            for p in (path, thumb_path(path)):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            self._prune_dirs(os.path.dirname(path))
+        with conn:
+            conn.executemany("DELETE FROM captures WHERE path = ?", [(p,) for p in paths])
+
+    def _prune_dirs(self, folder):
+        """Quita carpetas de día/mes/año que hayan quedado vacías."""
+        root = os.path.abspath(self.root)
+        for d in (os.path.join(folder, ".thumbs"), folder):
+            while os.path.abspath(d) != root and os.path.isdir(d):
+                try:
+                    os.rmdir(d)  # solo funciona si está vacía
+                except OSError:
+                    break
+                d = os.path.dirname(d)
+
+    def _settle_unwritten(self, conn, now):
+        """Capturas que nunca se marcaron como escritas: tamaño real del disco, o
+        fuera del índice si el fichero no existe. Así todas cuentan para la cuota."""
+        rows = conn.execute("SELECT path FROM captures WHERE size IS NULL AND ts < ?",
+                            (now - UNWRITTEN_GRACE_S,)).fetchall()
+        sizes, missing = [], []
+        for (path,) in rows:
+            try:
+                sizes.append((os.path.getsize(path), path))
+            except OSError:
+                missing.append((path,))
+        with conn:
+            conn.executemany("UPDATE captures SET size = ? WHERE path = ?", sizes)
+            conn.executemany("DELETE FROM captures WHERE path = ?", missing)
+
+    def enforce_quotas(self, conn):
+        now = time.time()
+        self._settle_unwritten(conn, now)
+        expired = conn.execute(
+            "SELECT path FROM captures WHERE size IS NOT NULL AND NOT imported AND "
+            "((verdict IS NOT 'confirmed' AND ts < ?) OR (verdict = 'confirmed' AND ts < ?))",
+            (now - self.max_age_days * 86400, now - self.confirmed_max_age_days * 86400)).fetchall()
+        if expired:
+            self._delete(conn, [r[0] for r in expired])
+            self._log(f"🗑 Retención: {len(expired)} capturas caducadas eliminadas")
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM captures").fetchone()[0]
+        freed, removed = 0, 0
+        for cond in EVICTION_ORDER:
+            if total - freed <= self.max_bytes:
+                break
+            rows = conn.execute(
+                f"SELECT path, size FROM captures WHERE size IS NOT NULL AND {cond} ORDER BY ts").fetchall()
+            batch = []
+            for path, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                batch.append(path)
+                freed += size
+            self._delete(conn, batch)
+            removed += len(batch)
+        if removed:
+            self._log(f"🗑 Cuota de disco: {removed} capturas eliminadas ({freed / 1024 ** 2:.0f} MB)")
+
+    def _import_existing(self, conn):
+        """Indexa una vez las capturas antiguas (carpeta plana) que no estén en el índice.
+
+        Se importan como confirmadas y sin caducidad por antigüedad: antes del
+        índice no se borraba nada, y entre ellas hay incidentes confirmados.
+        """
+        if conn.execute("SELECT 1 FROM captures LIMIT 1").fetchone() or not os.path.isdir(self.root):
+            return
+        rows = []
+        for folder, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d != ".thumbs"]
+            for name in files:
+                low = name.lower()
+                if not low.endswith(IMAGE_EXTS + (".avi",)):
+                    continue
+                path = os.path.join(folder, name)
+                st = os.stat(path)
+                rows.append((path, st.st_mtime, "clip" if low.endswith(".avi") else "snapshot", st.st_size))
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO captures (path, ts, kind, size, verdict, imported) "
+                             "VALUES (?, ?, ?, ?, 'confirmed', 1)", rows)
@@ -0,0 +1,169 @@
+# =============================================================================
+# AntiÑapas-Pons: Escritor asíncrono de capturas y grabaciones
+# Desc.  : Todo el trabajo de disco de una emergencia (foto, miniaturas,
+#          creación del VideoWriter, escritura de frames) se hace en un hilo
+#          propio. El bucle de detección solo encola y nunca se bloquea: los
+#          frames de vídeo pendientes se limitan a `lag_seconds` del clip
+#          (fps del clip × segundos, con tope `max_frames`; ~1.2 MB cada uno
+#          a 860x484) y, si se supera, el frame se descarta y se avisa de que
+#          el escritor va retrasado. Foto, apertura y cierre no se descartan.
+#          Los frames llevan su marca de tiempo real y el clip se rellena o
+#          recorta para que su duración coincida con el tiempo real.
+# =============================================================================
+
+import datetime
+import queue
+import threading
+
+import cv2
+
+from metrics import registry as metrics
+from thumb_cache import write_thumb
+
+
+class CaptureWriter:
+    """Hilo de escritura de fotos y clips de emergencia."""
+
+    def __init__(self, lag_seconds=1.5, max_frames=45, on_event=None, on_thumbnail=None, on_written=None,
+                 thumb_size=(200, 112)):
+        # Sin tope en la cola: solo los frames de vídeo cuentan para el límite
+        self._q = queue.Queue()
+        self.lag_seconds = lag_seconds
+        self.max_frames = max_frames
+        self.frame_limit = max_frames       # se ajusta a los fps de cada clip
+        self._frames_in = 0                 # solo lo escribe el hilo de detección
+        self._frames_out = 0                # solo lo escribe el hilo escritor
+        self.on_event = on_event          # callback(msg): avisos de retraso / errores
+        self.on_thumbnail = on_thumbnail  # callback(path, rgb): miniatura lista para la UI
+        self.on_written = on_written      # callback(path): fichero completo en disco
+        self.thumb_size = thumb_size
+        self.dropped = 0
+        self._lagging = False
+        self._thread = None
+        self._clip = None  # estado del clip abierto (solo lo toca el hilo escritor)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=5.0):
+        """Termina lo pendiente (cierra el clip abierto) y para el hilo."""
+        self._q.put(("quit",))
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ─────────────────────── API (hilo de detección) ─────────────────────────
+
+    def snapshot(self, path, frame):
+        return self._put(("snapshot", path, frame.copy()), critical=True)
+
+    def start_clip(self, path, size, fps, pre_frames=()):
+        """Abre un clip; `pre_frames` son (ts, frame reducido) del buffer pre-evento."""
+        self.frame_limit = max(1, min(self.max_frames, int(fps * self.lag_seconds)))
+        return self._put(("clip_start", path, size, fps, list(pre_frames)), critical=True)
+
+    def add_frame(self, frame, ts):
+        return self._put(("clip_frame", frame.copy(), ts))
+
+    def stop_clip(self):
+        return self._put(("clip_stop",), critical=True)
+
+    @property
+    def frames_pending(self):
+        return self._frames_in - self._frames_out
+
+    def _put(self, job, critical=False):
+        """Nunca bloquea. Los frames de vídeo se descartan si ya hay `frame_limit` pendientes."""
+        if not critical:
+            depth = self.frames_pending
+            if depth >= self.frame_limit:
+                self.dropped += 1
+                metrics.inc("writer_dropped")
+                self._notify_lag()
+                return False
+            self._frames_in += 1
+            metrics.set("writer_queue", depth + 1)
+            if depth + 1 >= self.frame_limit * 3 // 4:
+                self._notify_lag()
+            elif self._lagging and depth < self.frame_limit // 2:
+                self._lagging = False
+        self._q.put_nowait(job)
+        return True
+
+    def _notify_lag(self):
+        if not self._lagging:
+            self._lagging = True
+            if self.on_event:
+                self.on_event(f"⚠ Escritor de grabaciones retrasado (cola {self.frames_pending}, descartados {self.dropped})")
+
+    # ─────────────────────────── HILO ESCRITOR ───────────────────────────────
+
+    def _run(self):
+        while True:
+            job = self._q.get()
+            kind = job[0]
+            try:
+                if kind == "quit":
+                    self._close_clip()
+                    break
+                elif kind == "snapshot":
+                    self._write_snapshot(job[1], job[2])
+                elif kind == "clip_start":
+                    self._open_clip(*job[1:])
+                elif kind == "clip_frame":
+                    self._frames_out += 1
+                    self._write_frame(job[1], job[2])
+                elif kind == "clip_stop":
+                    self._close_clip()
+            except Exception as e:
+                if self.on_event:
+                    self.on_event(f"❌ Error de escritura ({kind}): {e}")
+
+    def _write_snapshot(self, path, frame):
+        cv2.imwrite(path, frame)
+        write_thumb(path, frame)  # caché del visor: generada una vez, aquí
+        if self.on_written:
+            self.on_written(path)
+        if self.on_thumbnail:
+            thumb = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+            self.on_thumbnail(path, cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB))
+
+    def _open_clip(self, path, size, fps, pre_frames):
+        self._close_clip()
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'XVID'), fps, size)
+        self._clip = {"path": path, "writer": writer, "size": size, "fps": fps, "t0": None, "index": 0, "last": None}
+        for ts, small in pre_frames:
+            # Al tamaño del clip (y siempre una copia: el anillo conserva el original)
+            if small.shape[1::-1] != tuple(size):
+                frame = cv2.resize(small, tuple(size), interpolation=cv2.INTER_LINEAR)
+            else:
+                frame = small.copy()
+            self._write_frame(frame, ts)
+
+    def _write_frame(self, frame, ts):
+        clip = self._clip
+        if clip is None:
+            return
+        if clip["t0"] is None:
+            clip["t0"] = ts
+        # Marca de tiempo real sobre el frame
+        stamp = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        cv2.putText(frame, stamp, (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+        # Posición en la línea de tiempo del clip a `fps` constantes
+        target = int(round((ts - clip["t0"]) * clip["fps"]))
+        if target < clip["index"]:
+            return  # llega antes de su hueco: se omite para no acelerar el vídeo
+        while clip["index"] < target and clip["last"] is not None:
+            clip["writer"].write(clip["last"])  # hueco: se repite el frame anterior
+            clip["index"] += 1
+        clip["writer"].write(frame)
+        clip["index"] += 1
+        clip["last"] = frame
+
+    def _close_clip(self):
+        if self._clip is not None:
+            self._clip["writer"].release()
+            if self.on_written:
+                self.on_written(self._clip["path"])
+            self._clip = None
@@ -0,0 +1,137 @@
+# =============================================================================
+# AntiÑapas-Pons: Visor de capturas paginado
+# Desc.  : La ventana aparece al instante con una rejilla fija de celdas. El
+#          listado (índice de capturas) y la lectura de miniaturas (`.thumbs/`)
+#          se hacen en un hilo de fondo, página a página; cada miniatura
+#          llega al hilo de Tk por el bus de la interfaz. Cambiar de página
+#          invalida la carga anterior, así que recorrer decenas de miles de
+#          capturas nunca bloquea la GUI.
+# =============================================================================
+
+import os
+import queue
+import threading
+
+import customtkinter as ctk
+from PIL import Image
+
+from thumb_cache import THUMB_SIZE, load_thumb
+
+
+class CapturesViewer(ctk.CTkToplevel):
+    """Rejilla de miniaturas con carga perezosa por páginas."""
+
+    def __init__(self, master, ui, lister, cols=4, rows=5):
+        super().__init__(master)
+        self.ui = ui                 # UiBus: el worker publica aquí, Tk lo aplica
+        self.lister = lister         # callable() -> rutas de fotos, más recientes primero
+        self.cols = cols
+        self.page_size = cols * rows
+        self.files = []
+        self.page = 0
+        self._gen = 0                # generación de la página pedida (descarta cargas viejas)
+        self._jobs = queue.Queue()
+        self._closed = False
+
+        self.title("🖼 Visor de Capturas de Emergencia")
+        self.geometry("800x560")
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=(10, 0))
+        self.btn_prev = ctk.CTkButton(bar, text="◀", width=40, command=lambda: self.show_page(self.page - 1))
+        self.btn_prev.pack(side="left")
+        self.lbl_page = ctk.CTkLabel(bar, text="Cargando...", font=("Consolas", 11))
+        self.lbl_page.pack(side="left", padx=10)
+        self.btn_next = ctk.CTkButton(bar, text="▶", width=40, command=lambda: self.show_page(self.page + 1))
+        self.btn_next.pack(side="left")
+
+        scroll = ctk.CTkScrollableFrame(self, fg_color="#0d1117")
+        scroll.pack(fill="both", expand=True, padx=10, pady=10)
+        # Celdas creadas una vez y reutilizadas en todas las páginas
+        blank = Image.new("RGB", THUMB_SIZE, "#161B22")
+        self._blank = ctk.CTkImage(light_image=blank, dark_image=blank, size=THUMB_SIZE)
+        self._images = [None] * self.page_size  # referencias vivas de las miniaturas mostradas
+        self.cells = []
+        for idx in range(self.page_size):
+            cell = ctk.CTkFrame(scroll, fg_color="#161B22", corner_radius=6)
+            cell.grid(row=idx // cols, column=idx % cols, padx=6, pady=6)
+            img_label = ctk.CTkLabel(cell, text="", image=self._blank)
+            img_label.pack(padx=4, pady=(4, 0))
+            name_label = ctk.CTkLabel(cell, text="", font=("Consolas", 8), text_color="#888")
+            name_label.pack(pady=(0, 4))
+            self.cells.append((cell, img_label, name_label))
+
+        self.bind("<Prior>", lambda e: self.show_page(self.page - 1))
+        self.bind("<Next>", lambda e: self.show_page(self.page + 1))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        threading.Thread(target=self._worker, daemon=True).start()
+        self._jobs.put(("list",))
+
+    # ───────────────────────── Hilo de Tk ────────────────────────────────────
+
+    @property
+    def pages(self):
+        return max(1, (len(self.files) + self.page_size - 1) // self.page_size)
+
+    def show_page(self, page):
+        if not self.files:
+            return
+        self.page = max(0, min(page, self.pages - 1))
+        self._gen += 1
+        start = self.page * self.page_size
+        names = self.files[start:start + self.page_size]
+        self.lbl_page.configure(text=f"Página {self.page + 1}/{self.pages} · {len(self.files)} capturas")
+        for idx, (cell, img_label, name_label) in enumerate(self.cells):
+            img_label.configure(image=self._blank, text="…" if idx < len(names) else "")
+            self._images[idx] = None
+            name_label.configure(text=os.path.basename(names[idx])[:22] if idx < len(names) else "")
+        self._jobs.put(("page", self._gen, names))
+
+    def _on_listed(self, files):
+        if self._closed:
+            return
+        self.files = files
+        if not files:
+            self.lbl_page.configure(text="No hay capturas guardadas.")
+            return
+        self.show_page(0)
+
+    def _on_thumb(self, gen, idx, img):
+        if self._closed or gen != self._gen:
+            return  # página ya abandonada
+        _, img_label, _ = self.cells[idx]
+        if img is None:
+            img_label.configure(text="(ilegible)")
+            return
+        ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=THUMB_SIZE)
+        img_label.configure(image=ctk_img, text="")
+        self._images[idx] = ctk_img
+
+    def close(self):
+        self._closed = True
+        self._jobs.put(("quit",))
+        self.destroy()
+
+    # ───────────────────────── Hilo de fondo ─────────────────────────────────
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job[0] == "quit":
+                return
+            if job[0] == "list":
+                try:
+                    files = self.lister()
+                except Exception:
+                    files = []
+                self.ui.call(self._on_listed, files)
+                continue
+            _, gen, names = job
+            for idx, path in enumerate(names):
+                if gen != self._gen or self._closed:
+                    break  # el usuario ya pasó de página
+                try:
+                    img = load_thumb(path)
+                except Exception:
+                    img = None
+                self.ui.call(self._on_thumb, gen, idx, img)
@@ -0,0 +1,191 @@
+# =============================================================================
+# AntiÑapas-Pons: Almacén de eventos en SQLite
+# Desc.  : Registro de eventos solo-añadir con escrituras por lotes desde un
+#          hilo propio (una transacción por lote), índices por fecha, tipo y
+#          zona, consultas paginadas para el escritorio y app_web, y
+#          exportación CSV en streaming (memoria constante). Si SQLite falla
+#          (p.ej. "database is locked" mientras app_web lee) el lote se
+#          reintenta con espera creciente; la cola está acotada y, si se
+#          llena, se descartan los eventos nuevos y se cuentan.
+# =============================================================================
+
+import csv
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import registry as metrics
+
+EVENTS_DB = "logs/events.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts      REAL    NOT NULL,
+    type    TEXT    NOT NULL,
+    zone    TEXT,
+    message TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts   ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(type, ts);
+CREATE INDEX IF NOT EXISTS idx_events_zone ON events(zone, ts);
+"""
+
+
+class EventStore:
+    """Eventos persistentes; add() nunca toca el disco en el hilo que llama."""
+
+    def __init__(self, path=EVENTS_DB, batch_size=200, flush_interval=0.5, max_queue=10000, max_backoff=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._q = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closing = False
+        self.dropped = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")      # lectores y escritor a la vez
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ─────────────────────────────── ESCRITURA ───────────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, message, event_type="INFO", zone=None, ts=None):
+        try:
+            self._q.put_nowait((time.time() if ts is None else ts, event_type, zone, message))
+        except queue.Full:
+            # El escritor lleva tiempo sin poder escribir: no bloquear a quien registra
+            self.dropped += 1
+            metrics.inc("events_dropped")
+
+    def close(self, timeout=5.0):
+        """Vacía lo pendiente y para el hilo escritor."""
+        self._closing = True
+        try:
+            self._q.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _writer(self):
+        conn = self._connect()
+        running = True
+        while running:
+            item = self._q.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Agrupar lo que llegue en la ventana (ráfagas de eventos → 1 transacción)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            conn = self._insert(conn, batch)
+        conn.close()
+
+    def _insert(self, conn, batch):
+        """Escribe el lote; ante un error de SQLite reconecta y reintenta con espera creciente."""
+        delay = 0.1
+        while True:
+            try:
+                with conn:
+                    conn.executemany("INSERT INTO events (ts, type, zone, message) VALUES (?, ?, ?, ?)", batch)
+                return conn
+            except sqlite3.Error as e:
+                metrics.inc("events_write_errors")
+                if self._closing:
+                    print(f"❌ Registro de eventos: {len(batch)} eventos sin guardar al cerrar ({e})")
+                    return conn
+                print(f"⚠ Registro de eventos: {e}; reintento en {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+                conn.close()
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    pass  # se reintenta con la conexión cerrada: vuelve a fallar y espera
+
+    # ─────────────────────────────── LECTURA ─────────────────────────────────
+
+    @staticmethod
+    def _where(event_type=None, zone=None, since=None, until=None):
+        clauses, args = [], []
+        if event_type:
+            clauses.append("type = ?")
+            args.append(event_type)
+        if zone:
+            clauses.append("zone = ?")
+            args.append(zone)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, page=1, page_size=50, **filters):
+        """Página `page` (1 = más recientes) como lista de dicts."""
+        where, args = self._where(**filters)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT id, ts, type, zone, message FROM events{where} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                args + [page_size, (max(1, page) - 1) * page_size]
+            ).fetchall()
+        finally:
+            conn.close()
+        return [{"id": r[0], "ts": r[1], "type": r[2], "zone": r[3], "message": r[4]} for r in rows]
+
+    def count(self, **filters):
+        where, args = self._where(**filters)
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM events{where}", args).fetchone()[0]
+        finally:
+            conn.close()
+
+    def export_csv(self, file_path, chunk=1000, **filters):
+        """Escribe el CSV leyendo el cursor por bloques: memoria constante."""
+        where, args = self._where(**filters)
+        conn = self._connect()
+        n = 0
+        try:
+            cur = conn.execute(f"SELECT ts, type, zone, message FROM events{where} ORDER BY ts, id", args)
+            with open(file_path, mode='w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Fecha y Hora", "Tipo", "Zona", "Evento"])
+                while True:
+                    rows = cur.fetchmany(chunk)
+                    if not rows:
+                        break
+                    writer.writerows(
+                        [datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"), t, z or "", m]
+                        for ts, t, z, m in rows
+                    )
+                    n += len(rows)
+        finally:
+            conn.close()
+        return n
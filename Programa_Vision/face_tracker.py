@@ -0,0 +1,172 @@
+# =============================================================================
+# AntiÑapas-Pons: Anonimización detectar-y-seguir
+# Desc.  : El Haar cascade solo se ejecuta cada N frames (o en el frame en
+#          que empieza el movimiento) y sobre las zonas con primer plano /
+#          ROI. Entre detecciones las caras se siguen con template matching
+#          local y se devuelven con un margen de seguridad que crece con el
+#          tiempo desde la última detección, para que ninguna cara quede sin
+#          tapar.
+# =============================================================================
+
+import cv2
+import numpy as np
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def _expand(box, pad, w_max, h_max):
+    x, y, w, h = box
+    x1, y1 = max(0, int(x - pad)), max(0, int(y - pad))
+    x2, y2 = min(w_max, int(x + w + pad)), min(h_max, int(y + h + pad))
+    return x1, y1, x2, y2
+
+
+class FaceAnonymizer:
+    """Devuelve las cajas de cara a tapar en cada frame con detección espaciada."""
+
+    def __init__(self, cascade, scale_factor=1.2, min_neighbors=6, min_size=None,
+                 detect_every=5, full_every=30, margin=0.15, drift_px=4,
+                 motion_ratio=0.002, max_missed=2):
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.detect_every = detect_every    # detección (en zonas activas) cada N frames
+        self.full_every = full_every        # detección en frame completo cada M frames
+        self.margin = margin                # margen proporcional al tamaño de la cara
+        self.drift_px = drift_px            # margen extra por frame sin detección
+        self.motion_ratio = motion_ratio    # fracción de primer plano que cuenta como movimiento
+        self.max_missed = max_missed        # detecciones fallidas antes de soltar una cara
+
+        self.tracks = []  # dicts {box, template, missed}
+        self.frame_idx = 0
+        self.since_detect = 0
+        self.detections = 0
+        self.was_moving = False
+
+    def reset(self):
+        self.tracks = []
+        self.since_detect = 0
+        self.was_moving = False
+
+    # ───────────────────────────── DETECCIÓN ─────────────────────────────────
+
+    def _detect(self, gray, region=None):
+        x0, y0 = 0, 0
+        if region is not None:
+            x0, y0, x1, y1 = region
+            gray = gray[y0:y1, x0:x1]
+        kwargs = {"minSize": self.min_size} if self.min_size else {}
+        faces = self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors, **kwargs)
+        self.detections += 1
+        return [(int(x) + x0, int(y) + y0, int(w), int(h)) for (x, y, w, h) in faces]
+
+    def _active_region(self, shape, fg_mask, roi):
+        """Caja que engloba primer plano, ROI y caras ya seguidas."""
+        h, w = shape[:2]
+        boxes = []
+        if fg_mask is not None and cv2.countNonZero(fg_mask):
+            boxes.append(cv2.boundingRect(cv2.findNonZero(fg_mask)))
+        for t in self.tracks:
+            boxes.append(t["box"])
+        if not boxes:
+            return tuple(roi) if roi else None
+        pad = 40  # holgura para caras parcialmente fuera del primer plano
+        x1 = max(0, min(b[0] for b in boxes) - pad)
+        y1 = max(0, min(b[1] for b in boxes) - pad)
+        x2 = min(w, max(b[0] + b[2] for b in boxes) + pad)
+        y2 = min(h, max(b[1] + b[3] for b in boxes) + pad)
+        if roi:
+            x1, y1 = max(x1, roi[0]), max(y1, roi[1])
+            x2, y2 = min(x2, roi[2]), min(y2, roi[3])
+        if x2 - x1 < 24 or y2 - y1 < 24:
+            return None
+        return x1, y1, x2, y2
+
+    def _merge(self, gray, faces):
+        matched = set()
+        for t in self.tracks:
+            best, best_iou = None, 0.3
+            for i, f in enumerate(faces):
+                if i not in matched and _iou(t["box"], f) > best_iou:
+                    best, best_iou = i, _iou(t["box"], f)
+            if best is None:
+                t["missed"] += 1
+            else:
+                matched.add(best)
+                t["box"] = faces[best]
+                t["missed"] = 0
+                t["template"] = self._template(gray, faces[best])
+        self.tracks = [t for t in self.tracks if t["missed"] <= self.max_missed]
+        for i, f in enumerate(faces):
+            if i not in matched:
+                self.tracks.append({"box": f, "template": self._template(gray, f), "missed": 0})
+
+    @staticmethod
+    def _template(gray, box):
+        x, y, w, h = box
+        return gray[y:y + h, x:x + w].copy()
+
+    # ───────────────────────────── SEGUIMIENTO ───────────────────────────────
+
+    def _track(self, gray):
+        h_img, w_img = gray.shape[:2]
+        for t in self.tracks:
+            x, y, w, h = t["box"]
+            tpl = t["template"]
+            if tpl.size == 0:
+                continue
+            sx1, sy1, sx2, sy2 = _expand(t["box"], max(w, h) // 2, w_img, h_img)
+            window = gray[sy1:sy2, sx1:sx2]
+            if window.shape[0] < tpl.shape[0] or window.shape[1] < tpl.shape[1]:
+                continue
+            res = cv2.matchTemplate(window, tpl, cv2.TM_CCOEFF_NORMED)
+            _, score, _, loc = cv2.minMaxLoc(res)
+            if score > 0.5:
+                t["box"] = (sx1 + loc[0], sy1 + loc[1], w, h)
+
+    # ─────────────────────────────── API ─────────────────────────────────────
+
+    def update(self, frame, gray=None, fg_mask=None, roi=None):
+        """Actualiza el estado con un frame y devuelve las cajas (x, y, w, h) a tapar.
+
+        `fg_mask` (opcional) es la máscara de primer plano más reciente; cuando
+        empieza el movimiento y no hay caras seguidas se adelanta la detección
+        (solo en ese frame: con movimiento sostenido manda `detect_every`).
+        `roi` limita la búsqueda.
+        """
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frame_idx += 1
+        self.since_detect += 1
+
+        moving = fg_mask is not None and np.count_nonzero(fg_mask) > self.motion_ratio * fg_mask.size
+        onset, self.was_moving = moving and not self.was_moving, moving
+        if self.frame_idx % self.full_every == 1 or self.full_every == 1:
+            self._merge(gray, self._detect(gray))
+            self.since_detect = 0
+        elif self.since_detect >= self.detect_every or (onset and not self.tracks):
+            region = self._active_region(gray.shape, fg_mask, roi)
+            if region is not None:
+                self._merge(gray, self._detect(gray, region))
+            self.since_detect = 0
+        else:
+            self._track(gray)
+
+        # Margen de seguridad: crece con los frames desde la última detección
+        h_img, w_img = gray.shape[:2]
+        boxes = []
+        for t in self.tracks:
+            x, y, w, h = t["box"]
+            pad = self.margin * max(w, h) + self.drift_px * self.since_detect
+            x1, y1, x2, y2 = _expand(t["box"], pad, w_img, h_img)
+            boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
@@ -0,0 +1,129 @@
+# =============================================================================
+# AntiÑapas-Pons: Difusión MJPEG con codificación única
+# Desc.  : El detector publica su último frame procesado (sin copiar ni
+#          codificar). Un hilo propio lo codifica a JPEG UNA vez y reparte los
+#          mismos bytes a todos los espectadores. Cada espectador tiene una
+#          cola acotada: si va lento pierde frames, nunca frena a los demás
+#          ni a la detección. Sin espectadores no se codifica nada.
+# =============================================================================
+
+import queue
+import threading
+import time
+
+import cv2
+
+
+class Subscriber:
+    """Cola acotada de un espectador; al llenarse se descarta lo más viejo."""
+
+    def __init__(self, maxsize=2):
+        self.q = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, jpeg):
+        try:
+            self.q.put_nowait(jpeg)
+        except queue.Full:
+            try:
+                self.q.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.q.put_nowait(jpeg)
+            except queue.Full:
+                self.dropped += 1
+
+    def get(self, timeout=5.0):
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FrameBroadcaster:
+    """Codifica el último frame una vez y lo reparte a N espectadores."""
+
+    def __init__(self, max_fps=15, quality=75):
+        self.min_interval = 1.0 / max_fps
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self._cond = threading.Condition()
+        self._frame = None
+        self._fresh = False
+        self._subs = set()
+        self._subs_lock = threading.Lock()
+        self.frames_encoded = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ───────────────────────── Productor (detector) ──────────────────────────
+
+    def publish(self, frame_bgr):
+        """Deja el frame para el hilo codificador (O(1), sin copia)."""
+        with self._cond:
+            self._frame = frame_bgr
+            self._fresh = True
+            self._cond.notify()
+
+    # ──────────────────────────── Espectadores ───────────────────────────────
+
+    def subscribe(self, maxsize=2):
+        sub = Subscriber(maxsize)
+        with self._subs_lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._subs_lock:
+            self._subs.discard(sub)
+
+    @property
+    def viewers(self):
+        return len(self._subs)
+
+    def mjpeg_stream(self, sub, alive=None):
+        """Generador multipart/x-mixed-replace para una respuesta Flask.
+
+        `alive()` (opcional) dice si el productor sigue vivo: si no llegan
+        frames y devuelve False, el stream termina (el <img> recibe onerror).
+        """
+        try:
+            while True:
+                jpeg = sub.get()
+                if jpeg is None:
+                    if alive is not None and not alive():
+                        return
+                    continue
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " +
+                       str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+        finally:
+            self.unsubscribe(sub)
+
+    # ─────────────────────────── Hilo codificador ────────────────────────────
+
+    def _run(self):
+        last = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._fresh)
+                frame = self._frame
+                self._fresh = False
+            with self._subs_lock:
+                subs = list(self._subs)
+            if not subs:
+                continue  # nadie mirando: no se gasta CPU en codificar
+            wait = self.min_interval - (time.monotonic() - last)
+            if wait > 0:
+                time.sleep(wait)
+                with self._cond:  # tras esperar, mejor el frame más nuevo
+                    frame = self._frame
+                    self._fresh = False
+            ok, buf = cv2.imencode(".jpg", frame, self.params)
+            last = time.monotonic()
+            if not ok:
+                continue
+            jpeg = buf.tobytes()
+            self.frames_encoded += 1
+            for sub in subs:
+                sub.offer(jpeg)
@@ -0,0 +1,140 @@
+# =============================================================================
+# AntiÑapas-Pons: Captura desacoplada de la detección
+# Desc.  : Hilo dedicado que lee la cámara sin pausa y conserva solo el frame
+#          más reciente (buffer de una posición). Si la fuente cae, reconecta
+#          con espera exponencial en lugar de quemar un núcleo.
+# =============================================================================
+
+import threading
+import time
+
+import cv2
+
+
+class LatestFrameGrabber:
+    """Lee continuamente una fuente de vídeo y guarda solo el último frame.
+
+    El consumidor llama a read() y siempre recibe el frame más fresco; los
+    frames que no llegó a consumir se cuentan como descartados.
+    """
+
+    def __init__(self, source, backoff_min=0.5, backoff_max=8.0, on_event=None):
+        self.source = source
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.on_event = on_event  # callback(msg) para avisar de caídas/reconexiones
+
+        self.cap = None
+        self.running = False
+        self.connected = False
+        self._thread = None
+
+        # Buffer de una posición protegido por condición
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts = 0.0      # time.monotonic() de la captura
+        self._seq = 0             # número de frame capturado
+        self._last_read_seq = 0   # último número entregado al consumidor
+
+        # Estadísticas
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+
+    # ─────────────────────────── CICLO DE VIDA ───────────────────────────────
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self._release()
+
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        # Pedir al driver la cola mínima para no acumular frames viejos
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return self.cap.isOpened()
+
+    def _release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.connected = False
+
+    def _notify(self, msg):
+        if self.on_event:
+            self.on_event(msg)
+
+    # ─────────────────────────────── HILO ────────────────────────────────────
+
+    def _run(self):
+        backoff = self.backoff_min
+        while self.running:
+            if self.cap is None or not self.connected:
+                if self._open():
+                    if self.reconnects or self.frames_captured:
+                        self._notify(f"📷 Fuente '{self.source}' reconectada.")
+                    self.connected = True
+                    backoff = self.backoff_min
+                else:
+                    self._release()
+                    self._notify(f"❌ Fuente '{self.source}' no disponible. Reintento en {backoff:.1f}s")
+                    self._sleep(backoff)
+                    backoff = min(backoff * 2, self.backoff_max)
+                    continue
+
+            ret, frame = self.cap.read()
+            if not ret:
+                # Caída de la fuente: soltar y reconectar con espera
+                self._release()
+                self.reconnects += 1
+                self._notify(f"⚠ Fuente '{self.source}' perdida. Reconectando...")
+                self._sleep(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+
+            ts = time.monotonic()
+            with self._cond:
+                if self._frame is not None and self._seq > self._last_read_seq:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_ts = ts
+                self._seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def _sleep(self, seconds):
+        # Espera interrumpible por stop()
+        with self._cond:
+            self._cond.wait_for(lambda: not self.running, timeout=seconds)
+
+    # ──────────────────────────── CONSUMIDOR ─────────────────────────────────
+
+    def read(self, timeout=1.0):
+        """Devuelve (frame, capture_ts, seq) con el frame más nuevo aún no leído.
+
+        Bloquea hasta `timeout` segundos si no hay frame nuevo; en ese caso
+        devuelve (None, 0.0, seq) sin consumir CPU.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._last_read_seq or not self.running, timeout=timeout)
+            if self._seq <= self._last_read_seq:
+                return None, 0.0, self._last_read_seq
+            self._last_read_seq = self._seq
+            return self._frame, self._frame_ts, self._seq
+
+    def stats(self):
+        return {
+            "captured": self.frames_captured,
+            "dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "connected": self.connected,
+        }
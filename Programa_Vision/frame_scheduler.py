@@ -0,0 +1,94 @@
+# =============================================================================
+# AntiÑapas-Pons: Planificador de frames con presupuesto de tiempo
+# Desc.  : Mide el coste de cada etapa del bucle (media móvil) y compara el
+#          total con el presupuesto por frame. Si no llega, recorta trabajo
+#          OPCIONAL por orden de prioridad y, cuando sobra margen, lo
+#          recupera (con histéresis para no oscilar):
+#              nivel 1 → la vista previa salta frames
+#              nivel 2 → la anonimización detecta con menos frecuencia
+#                        (el seguimiento de caras sigue en cada frame)
+#              nivel 3 → sin rejilla en el HUD
+#          La comprobación de zonas y el tapado de caras nunca se recortan.
+# =============================================================================
+
+from metrics import registry as metrics
+
+LEVEL_NAMES = ["completo", "vista previa reducida", "anonimización reducida", "sin rejilla"]
+MAX_LEVEL = len(LEVEL_NAMES) - 1
+
+
+class FrameScheduler:
+    """Presupuesto por frame y nivel de degradación del trabajo opcional."""
+
+    def __init__(self, budget_ms=50.0, alpha=0.1, raise_after=5, lower_after=60, headroom=0.7,
+                 preview_every=2, anonymize_every=3, on_change=None):
+        self.budget_ms = budget_ms
+        self.alpha = alpha                  # suavizado de la media de cada etapa
+        self.raise_after = raise_after      # frames seguidos fuera de plazo para subir de nivel
+        self.lower_after = lower_after      # frames seguidos con margen para bajar
+        self.headroom = headroom            # "con margen" = por debajo de budget * headroom
+        self.preview_every = preview_every
+        self.anonymize_every = anonymize_every
+        self.on_change = on_change          # callback(nivel, nombre)
+        self.costs = {}                     # etapa -> ms (media móvil)
+        self.level = 0
+        self.frame_idx = 0
+        self.misses = 0
+        self._over = 0
+        self._under = 0
+
+    # ─────────────────────────── Medición ────────────────────────────────────
+
+    def lap(self, name, t0):
+        """Como metrics.lap, y además alimenta la media de coste de la etapa."""
+        now = metrics.lap(name, t0)
+        ms = (now - t0) * 1000
+        prev = self.costs.get(name)
+        self.costs[name] = ms if prev is None else prev + self.alpha * (ms - prev)
+        return now
+
+    def predicted_ms(self):
+        """Coste esperado del próximo frame: suma de las medias de cada etapa."""
+        return sum(ms for name, ms in self.costs.items() if name != "loop")
+
+    def end_frame(self, frame_ms):
+        """Cierra el frame con su duración total y ajusta el nivel."""
+        self.frame_idx += 1
+        if frame_ms > self.budget_ms:
+            self.misses += 1
+        if frame_ms > self.budget_ms or self.predicted_ms() > self.budget_ms:
+            self._over += 1
+            self._under = 0
+        elif frame_ms < self.budget_ms * self.headroom:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= self.raise_after and self.level < MAX_LEVEL:
+            self._set_level(self.level + 1)
+        elif self._under >= self.lower_after and self.level > 0:
+            self._set_level(self.level - 1)
+        metrics.set("degradation_level", self.level)
+        metrics.set("deadline_misses", self.misses)
+        metrics.set("predicted_frame_ms", round(self.predicted_ms(), 2))
+
+    def _set_level(self, level):
+        self.level = level
+        self._over = self._under = 0
+        if self.on_change:
+            self.on_change(level, LEVEL_NAMES[level])
+
+    # ─────────────────────────── Decisiones ──────────────────────────────────
+
+    def run_preview(self):
+        return self.level < 1 or self.frame_idx % self.preview_every == 0
+
+    def anonymize_intervals(self, detect_every, full_every):
+        """Intervalos de detección de caras para el nivel actual. Solo se espacia
+        la detección: el seguimiento y el margen siguen en todos los frames."""
+        k = self.anonymize_every if self.level >= 2 else 1
+        return detect_every * k, full_every * k
+
+    def grid_allowed(self):
+        return self.level < 3
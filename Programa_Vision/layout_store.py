@@ -0,0 +1,260 @@
+# =============================================================================
+# AntiÑapas-Pons: Layout de zonas compartido (escritorio + portal web)
+# Desc.  : Un único documento versionado (logs/layout.json) con el ROI y las
+#          zonas ROJA/ÁMBAR como polígonos en coordenadas normalizadas (0..1),
+#          así vale para la pantalla de 860x484, el lienzo web y la cámara.
+#          Los cambios se aplican en memoria al momento, se notifican a los
+#          suscriptores y se escriben de forma atómica agrupados (debounce).
+#          Un hilo vigila el fichero: si otro proceso lo cambia, se recarga y
+#          se notifica, de modo que el detector cambia de zonas en caliente.
+#          Cada escritura lleva un `rev` y la lista de los anteriores (`revs`):
+#          si otro proceso escribe encima sin incluir nuestros cambios, se
+#          adopta su layout y nuestras ediciones se vuelven a aplicar.
+# =============================================================================
+
+import copy
+import json
+import os
+import threading
+import time
+
+from web_state import CachedJsonFile
+
+LAYOUT_FILE = "logs/layout.json"
+LEGACY_WEB_LAYOUT = "logs/current_layout.json"  # editor web antiguo: píxeles de su lienzo
+
+EMPTY_LAYOUT = {"version": 0, "rev": None, "revs": [], "updated_by": None, "roi": None, "zones": [], "objects": []}
+MAX_REVS = 16
+
+
+# ─────────────────────────────── CONVERSIONES ────────────────────────────────
+
+def rect_to_points(rect, size):
+    """Rectángulo (x1, y1, x2, y2) en píxeles → polígono normalizado."""
+    w, h = size
+    x1, y1, x2, y2 = rect
+    return [{"x": x1 / w, "y": y1 / h}, {"x": x2 / w, "y": y1 / h},
+            {"x": x2 / w, "y": y2 / h}, {"x": x1 / w, "y": y2 / h}]
+
+
+def points_to_rect(points, size):
+    """Polígono normalizado → rectángulo envolvente en píxeles."""
+    w, h = size
+    xs = [p["x"] * w for p in points]
+    ys = [p["y"] * h for p in points]
+    return int(round(min(xs))), int(round(min(ys))), int(round(max(xs))), int(round(max(ys)))
+
+
+def zone_from_rect(zone_type, rect, size):
+    """Rectángulo del escritorio → zona del layout."""
+    return {"type": zone_type, "points": rect_to_points(rect, size)}
+
+
+def layout_from_rects(roi, red_zones, amber_zones, size):
+    """Zonas del escritorio (rectángulos) → campos del layout."""
+    zones = [zone_from_rect("RED", r, size) for r in red_zones]
+    zones += [zone_from_rect("AMBER", r, size) for r in amber_zones]
+    return {"roi": rect_to_points(roi, size) if roi else None, "zones": zones}
+
+
+def rects_from_layout(layout, size):
+    """Layout → (roi, rojas, ámbar) como rectángulos envolventes en píxeles."""
+    roi = points_to_rect(layout["roi"], size) if layout.get("roi") else None
+    red = [points_to_rect(z["points"], size) for z in layout.get("zones", []) if z["type"] == "RED"]
+    amber = [points_to_rect(z["points"], size) for z in layout.get("zones", []) if z["type"] == "AMBER"]
+    return roi, red, amber
+
+
+def zones_to_pixels(layout, size):
+    """Zonas ROJA/ÁMBAR como polígonos en píxeles (formato de AntiNapasVision)."""
+    w, h = size
+    return [{"type": z["type"], "points": [{"x": p["x"] * w, "y": p["y"] * h} for p in z["points"]]}
+            for z in layout.get("zones", [])]
+
+
+def normalize_zones(zones, size):
+    """Zonas en píxeles de un lienzo de tamaño `size` → normalizadas."""
+    w, h = size
+    return [{"type": z["type"], "points": [{"x": p["x"] / w, "y": p["y"] / h} for p in z["points"]]}
+            for z in zones]
+
+
+def read_layout(path=LAYOUT_FILE):
+    """Layout guardado en disco, sin hilo de vigilancia (herramientas de consola)."""
+    return LayoutStore(path).get()
+
+
+def import_legacy_web(store, size, path=LEGACY_WEB_LAYOUT):
+    """Zonas del editor web antiguo → layout compartido, solo si aún está vacío.
+
+    El fichero antiguo guarda píxeles sin el tamaño del lienzo: se asume
+    `size` y, si algún punto cae fuera, ValueError en vez de importar zonas
+    deformadas. Devuelve True si se importó.
+    """
+    if store.version != 0 or not os.path.exists(path):
+        return False
+    with open(path, "r") as f:
+        legacy = json.load(f)
+    zones = [z for z in legacy.get("zones", []) if z.get("type") in ("RED", "AMBER")]
+    w, h = size
+    for z in zones:
+        for p in z["points"]:
+            if not (0 <= p["x"] <= w and 0 <= p["y"] <= h):
+                raise ValueError(f"{path}: punto ({p['x']:.0f}, {p['y']:.0f}) fuera del lienzo {w}x{h} supuesto; "
+                                 f"indica el tamaño real del lienzo antiguo o borra el fichero")
+    if not zones and not legacy.get("objects"):
+        return False
+    store.update({"zones": normalize_zones(zones, size), "objects": legacy.get("objects", [])}, "web-legacy")
+    return True
+
+
+# ─────────────────────────────── ALMACÉN ─────────────────────────────────────
+
+class LayoutStore:
+    """Layout versionado con escritura atómica diferida y recarga en caliente."""
+
+    def __init__(self, path=LAYOUT_FILE, debounce=0.5, poll_interval=0.5):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = CachedJsonFile(path, None)
+        self._cond = threading.Condition()
+        self._subscribers = []
+        self._write_due = None     # monotonic en el que toca escribir (None = nada pendiente)
+        self._running = False
+        self._thread = None
+        self.layout = self._base = self._from_disk()  # _base: último layout visto en disco
+        self._edits = []           # ediciones locales (changes, source) aún no confirmadas en disco
+        self._written = None       # (rev, nº de ediciones) de nuestra última escritura
+
+    @property
+    def version(self):
+        return self.layout["version"]
+
+    def get(self):
+        """Layout actual (no modificar: se sustituye entero en cada cambio)."""
+        return self.layout
+
+    def subscribe(self, fn):
+        """fn(layout) en cada cambio, local o de otro proceso (desde otro hilo)."""
+        self._subscribers.append(fn)
+
+    def update(self, changes, source):
+        """Aplica `changes` (roi / zones / objects), sube la versión y programa la escritura.
+
+        `changes` es un dict o una función layout → dict. La función se vuelve
+        a aplicar si otro proceso escribe antes que nosotros, así "añadir una
+        zona" no borra lo que haya guardado el otro mientras tanto.
+        """
+        with self._cond:
+            self._sync()  # partir de lo último que haya en disco
+            self._edits.append((changes, source))
+            self.layout = self._apply(self.layout, changes, source)
+            layout = self.layout
+            self._write_due = time.monotonic() + self.debounce
+            self._cond.notify()
+        self._notify(layout)
+        return layout["version"]
+
+    def _notify(self, layout):
+        for fn in list(self._subscribers):
+            try:
+                fn(layout)
+            except Exception as e:
+                print(f"Error notificando layout: {e}")
+
+    # ─────────────────────────────── DISCO ───────────────────────────────────
+
+    def _from_disk(self):
+        return dict(copy.deepcopy(EMPTY_LAYOUT), **(self._file.get() or {}))
+
+    @staticmethod
+    def _apply(layout, changes, source):
+        if callable(changes):
+            changes = changes(layout)
+        new = dict(layout, **changes)
+        new["version"] = layout["version"] + 1
+        new["updated_by"] = source
+        return new
+
+    def _sync(self):
+        """Concilia con el disco si otro proceso lo ha escrito. True si cambió el layout.
+
+        Las ediciones ya escritas que el disco incluye (nuestro rev está en su
+        historial) se dan por confirmadas; el resto se vuelve a aplicar sobre
+        el layout del disco y se programa otra escritura.
+        """
+        if not self._file.changed():
+            return False
+        disk = self._from_disk()
+        if disk["rev"] == self._base["rev"]:
+            return False
+        if self._written and self._written[0] in disk["revs"]:
+            self._edits = self._edits[self._written[1]:]
+        self._written = None
+        old, layout = self.layout, disk
+        for changes, source in self._edits:
+            layout = self._apply(layout, changes, source)
+        self._base, self.layout = disk, layout
+        if self._edits and self._write_due is None:
+            self._write_due = time.monotonic()
+        return any(old.get(k) != layout.get(k) for k in ("roi", "zones", "objects"))
+
+    def _write(self):
+        """Escritura atómica (tmp + os.replace) sobre la última versión del disco."""
+        self._write_due = None
+        changed = self._sync()  # releer justo antes: otro proceso puede haber escrito
+        if self._written and self._base["rev"] == self._written[0]:
+            # Nadie ha escrito encima de nuestra última escritura: confirmada
+            self._edits = self._edits[self._written[1]:]
+            self._written = None
+        if not self._edits:
+            return changed
+        rev = os.urandom(4).hex()
+        layout = dict(self.layout, rev=rev, revs=(self._base["revs"] + [rev])[-MAX_REVS:])
+        layout["version"] = max(layout["version"], self._base["version"] + 1)
+        self._file.set(layout)
+        self.layout = self._base = layout
+        self._written = (rev, len(self._edits))
+        return changed
+
+    # ─────────────────────────────── HILO ────────────────────────────────────
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Para el hilo y escribe lo pendiente."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(2.0)
+        self.flush()
+
+    def flush(self):
+        with self._cond:
+            changed = self._write_due is not None and self._write()
+            layout = self.layout
+        if changed:
+            self._notify(layout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                timeout = self.poll_interval
+                if self._write_due is not None:
+                    timeout = min(timeout, max(0.0, self._write_due - time.monotonic()))
+                self._cond.wait(timeout)
+                if self._write_due is not None and time.monotonic() >= self._write_due:
+                    changed = self._write()
+                else:
+                    changed = self._sync()
+                layout = self.layout
+            if changed:
+                self._notify(layout)
@@ -9,7 +9,7 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
-from PIL import Image, ImageTk
+from PIL import Image
 import cv2
 import threading
 import time
@@ -17,9 +17,26 @@ import os
 import numpy as np
 import winsound
 import json
-import csv
 import datetime
 
+from frame_grabber import LatestFrameGrabber
+from frame_scheduler import FrameScheduler
+from capture_store import CaptureStore
+from capture_writer import CaptureWriter
+from captures_viewer import CapturesViewer
+from event_buffer import PreEventBuffer
+from event_store import EventStore
+from face_tracker import FaceAnonymizer
+from hud_overlay import HudOverlay
+from layout_store import LayoutStore, layout_from_rects, rect_to_points, rects_from_layout, zone_from_rect
+from metrics import registry as metrics
+from bg_models import DEFAULT_BACKEND, LearningSchedule
+from motion_pipeline import MotionPipeline, SEVERITY
+from multi_camera import MultiCameraEngine
+from plc_bridge import PLCBridge
+from preview_display import PreviewDisplay
+from ui_bus import UiBus
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
@@ -35,23 +52,76 @@ class AntiNapasApp(ctk.CTk):
         self.roi_zone = None
         self.red_zones = []
         self.amber_zones = []
+        # Layout compartido con el portal web (logs/layout.json, versionado)
+        self.layout = LayoutStore().start()
+        self.layout_source = f"escritorio-{os.getpid()}"
+        self._pending_layout = None  # layout nuevo (local o externo): lo aplica el hilo de vídeo
         self.last_status = "SAFE"
         self.grid_visible = False
+        self.hud = HudOverlay((860, 484))  # rejilla, ROI, zonas y leyenda pre-renderizadas
+        self.preview_fps = 15              # la vista previa va a su ritmo, no al de la detección
+        self.frame_budget_ms = 50          # presupuesto por frame; si no llega, se recorta lo opcional
+        self.faces = []                    # cajas de caras tapadas en el último frame
         self.drawing_type = None
         self.camera_source = 0
         self.last_capture_path = None
-        self.event_history = []
+        self.events = EventStore().start()  # registro persistente en logs/events.db
+
+        # Latencia captura → decisión (ms) y frames descartados por el grabber
+        self.last_latency_ms = 0.0
+        self.frames_dropped = 0
+        self.decision_t = 0.0  # perf_counter de la última decisión (latencia detección → alarma)
+        self.loop_fps = 0.0
+        self._last_loop_t = None
 
         # Grabación de vídeo
-        self.video_writer = None
         self.is_recording = False
         self.recording_path = None
         self.recording_start_time = None
         self.MAX_RECORDING_SECONDS = 10
 
-        # Detector de anomalías
-        self.back_sub = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=50, detectShadows=True)
+        # Buffer pre-evento: últimos segundos en JPEG para incluirlos en el clip
+        self.prebuffer_seconds = 5
+        self.prebuffer_mb = 32
+        self.pre_buffer = PreEventBuffer(self.prebuffer_seconds, self.prebuffer_mb * 1024 * 1024)
+
+        # Los hilos de trabajo publican aquí; Tk lo aplica agrupado cada 50 ms
+        self.ui = UiBus(self, interval_ms=50, console_lines=2000)
+
+        # Fotos y clips se escriben en segundo plano: la detección nunca espera al disco
+        self.capture_writer = CaptureWriter(
+            on_event=self.log_event,
+            on_thumbnail=lambda path, rgb: self.ui.post("last_capture", self.show_last_capture, rgb),
+            on_written=lambda path: self.captures.mark_written(path)
+        ).start()
+        # Índice de capturas + cuotas (se crea tras cargar la configuración)
+        self.capture_max_age_days = 30
+        self.capture_max_gb = 20.0
+        self.captures = None
+
+        # Detector de anomalías (fondo + zonas de la cámara principal)
+        self.motion = MotionPipeline()
         self.anomaly_threshold = 1200
+        self.motion_crop_roi = True   # el fondo solo se modela dentro del ROI
+        self.motion_scale = 1.0       # 0.5 / 0.25: resolución reducida (experimental, ver MotionPipeline)
+        self.motion_backend = DEFAULT_BACKEND  # modelo de fondo (bg_models.BACKENDS)
+        self.motion_backend_params = {}
+        self.motion_learning_rates = {}        # ritmo por modo; vacío = DEFAULT_RATES
+
+        # PLC (OPC UA): paro de emergencia por ruta prioritaria. Sin endpoint, desactivado
+        self.plc_endpoint = None          # p. ej. "opc.tcp://192.168.0.10:4840"
+        self.plc_deadline_ms = 100        # plazo captura → confirmación del PLC
+        self.plc = None
+        self.capture_ts = 0.0             # time.monotonic() del frame en decisión
+
+        # Cámaras adicionales (modo multicámara, config "cameras" en factory_settings.json)
+        self.extra_cameras = []
+        self.multicam = None
+        self.primary_status = "SAFE"      # último estado de la cámara principal
+        self.primary_ts = 0.0             # time.monotonic() de captura del frame de ese estado
+        self.last_frame = None            # último frame de la principal (foto si la alarma es de otra)
+        self.MULTICAM_POLL_S = 0.02       # espera máx. del frame principal con multicámara
+        self.PRIMARY_STALE_S = 1.0        # sin frames de la principal más tiempo → cuenta como SAFE
 
         # Estadísticas
         self.confirmed_anomalies = 0
@@ -75,10 +145,31 @@ class AntiNapasApp(ctk.CTk):
         self.face_cascade = cv2.CascadeClassifier(
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
+        # Detección completa cada pocos frames, seguimiento barato entre medias
+        self.anonymizer = FaceAnonymizer(self.face_cascade, 1.2, 6, min_size=(60, 60))
+        self.anonymizer_intervals = (self.anonymizer.detect_every, self.anonymizer.full_every)
 
         self.setup_ui()
+        self.ui.start(self.console)
         self.load_settings()
+        self.apply_layout(self.layout.get())
+        self.layout.subscribe(self.on_layout_changed)
+        self.captures = CaptureStore(
+            max_age_days=self.capture_max_age_days, max_gb=self.capture_max_gb, on_event=self.log_event
+        ).start()
+        self.scheduler = FrameScheduler(
+            self.frame_budget_ms,
+            on_change=lambda level, name: self.log_event(f"⏱ Carga: nivel {level} ({name})", "PERF")
+        )
+        self.display = PreviewDisplay(
+            self.canvas, self.video_bg_id, fps=self.preview_fps,
+            danger_check=lambda: self.last_status == "DANGER" or self.mode == "EMERGENCIA"
+        )
+        self.display.start()
         self.start_camera()
+        self.start_multicam()
+        self.start_plc()
+        metrics.start_exporter()
 
     # ─────────────────────────────── UI ──────────────────────────────────────
 
@@ -197,6 +288,10 @@ class AntiNapasApp(ctk.CTk):
         self.lbl_rec_status = ctk.CTkLabel(self.sidebar, text="", font=("Arial", 9), text_color="#E74C3C")
         self.lbl_rec_status.pack(padx=15, anchor="w")
 
+        # Estado por cámara (solo en modo multicámara)
+        self.lbl_multicam = ctk.CTkLabel(self.sidebar, text="", font=("Consolas", 9), text_color="#aaa", justify="left")
+        self.lbl_multicam.pack(padx=15, pady=(5, 0), anchor="w")
+
         # ── ÁREA PRINCIPAL ──
         self.main_content = ctk.CTkFrame(self, corner_radius=12, fg_color="#0D1117")
         self.main_content.grid(row=0, column=1, sticky="nsew", padx=8, pady=8)
@@ -221,150 +316,253 @@ class AntiNapasApp(ctk.CTk):
     # ─────────────────────────────── CÁMARA ──────────────────────────────────
 
     def start_camera(self):
-        self.cap = cv2.VideoCapture(self.camera_source)
+        self.grabber = LatestFrameGrabber(
+            self.camera_source,
+            on_event=self.log_event
+        ).start()
         self.video_running = True
         threading.Thread(target=self.update_video, daemon=True).start()
 
+    def stop_camera(self):
+        self.video_running = False
+        time.sleep(0.3)
+        if hasattr(self, 'grabber'):
+            self.grabber.stop()
+
     def update_video(self):
         while self.video_running:
-            ret, frame = self.cap.read()
-            if not ret:
+            # Siempre el frame más reciente; bloquea sin girar si la cámara cae.
+            # Con multicámara la espera es corta: las demás cámaras se evalúan
+            # en cada pasada aunque la principal no entregue frame
+            frame, capture_ts, _ = self.grabber.read(timeout=self.MULTICAM_POLL_S if self.multicam else 0.5)
+            pending, self._pending_layout = self._pending_layout, None
+            if pending is not None:
+                self.apply_layout(pending)  # zonas nuevas en caliente, mismo modelo de fondo
+            if frame is None:
+                if self.multicam:
+                    self.check_extra_cameras()
                 continue
+            t = loop_t = time.perf_counter()
+            if self._last_loop_t is not None:
+                self.loop_fps = 0.9 * self.loop_fps + 0.1 / max(loop_t - self._last_loop_t, 1e-6)
+            self._last_loop_t = loop_t
             frame = cv2.resize(frame, (860, 484))
-
-            # Privacidad: cara de chimpancé
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.2, 6, minSize=(60, 60))
-            for (x, y, w, h) in faces:
+            t = self.scheduler.lap("resize", t)
+
+            # Privacidad: cara de chimpancé. Bajo carga se detecta con menos frecuencia,
+            # pero update() corre en cada frame: seguimiento y margen nunca se saltan
+            self.anonymizer.detect_every, self.anonymizer.full_every = \
+                self.scheduler.anonymize_intervals(*self.anonymizer_intervals)
+            self.faces = self.anonymizer.update(frame, fg_mask=self.motion.fg_mask, roi=self.roi_zone)
+            for (x, y, w, h) in self.faces:
                 self.apply_chimp_face(frame, x, y, w, h)
+            t = self.scheduler.lap("anonymize", t)
 
             # Lógica de seguridad
             current_status, rects = "SAFE", []
             if self.mode == "AUTOMATICO":
                 current_status, rects = self.process_security(frame)
-            elif self.mode == "CALIBRACION":
-                self.back_sub.apply(frame)
             else:
-                self.back_sub.apply(frame, learningRate=0.005)
-
-            self.handle_security_logic(current_status, frame)
-
-            # Grabación de vídeo
-            if self.is_recording and self.video_writer:
-                if time.time() - self.recording_start_time <= self.MAX_RECORDING_SECONDS:
-                    self.video_writer.write(frame)
+                self.motion.learn(frame, mode=self.mode)  # ritmo según motion_learning_rates
+            self.primary_status, self.primary_ts = current_status, capture_ts
+            self.last_frame = frame
+
+            # Estado combinado con el resto de cámaras (el plazo del PLC se mide
+            # desde la captura del frame que decide: el de la cámara adicional si manda ella)
+            current_status, alarm_frame, self.capture_ts = \
+                self.combine_extra_cameras(current_status, frame, capture_ts)
+            t = self.decision_t = self.scheduler.lap("security", t)
+
+            self.handle_security_logic(current_status, alarm_frame)
+            t = self.scheduler.lap("alarm_logic", t)
+            self.last_latency_ms = (time.monotonic() - capture_ts) * 1000
+            self.frames_dropped = self.grabber.frames_dropped
+            metrics.observe("capture_to_decision", self.last_latency_ms)
+            metrics.set("frames_dropped", self.frames_dropped)
+
+            # Grabación de vídeo (y buffer pre-evento siempre alimentado)
+            now = time.time()
+            self.pre_buffer.push(frame, now)
+            if self.is_recording:
+                if now - self.recording_start_time <= self.MAX_RECORDING_SECONDS:
+                    self.capture_writer.add_frame(frame, now)
                 else:
                     self.stop_recording()
+            t = self.scheduler.lap("recording", t)
 
             # ── HUD sobre el frame ──
-            if self.grid_visible:
-                for x in range(0, 860, 50):
-                    cv2.line(frame, (x, 0), (x, 484), (40, 40, 40), 1)
-                for y in range(0, 484, 50):
-                    cv2.line(frame, (0, y), (860, y), (40, 40, 40), 1)
-
-            if self.roi_zone:
-                cv2.rectangle(frame, (self.roi_zone[0], self.roi_zone[1]), (self.roi_zone[2], self.roi_zone[3]), (255, 120, 0), 2)
-            for rx, ry, rw, rh in rects:
-                cv2.rectangle(frame, (rx, ry), (rx + rw, ry + rh), (0, 255, 0), 2)
-                cv2.putText(frame, "MOTION", (rx, ry - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
-            for z in self.amber_zones:
-                cv2.rectangle(frame, (z[0], z[1]), (z[2], z[3]), (0, 165, 255), 2)
-            for z in self.red_zones:
-                cv2.rectangle(frame, (z[0], z[1]), (z[2], z[3]), (0, 0, 255), 2)
-
-            # Timestamp en esquina superior derecha
-            ts = datetime.datetime.now().strftime("%Y-%m-%d  %H:%M:%S")
-            cv2.putText(frame, ts, (860 - 230, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (180, 180, 180), 1, cv2.LINE_AA)
-
-            # Indicador de modo
-            mode_color = {"AUTOMATICO": (0, 200, 0), "CALIBRACION": (0, 165, 255), "STOP": (100, 100, 100), "EMERGENCIA": (0, 0, 255)}.get(self.mode, (100, 100, 100))
-            cv2.putText(frame, f"  {self.mode}", (10, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.6, mode_color, 2, cv2.LINE_AA)
+            # Capa estática (rejilla, ROI, zonas, leyenda) + movimiento, hora, modo, REC y
+            # latencia captura → decisión, frames descartados y nivel de degradación
+            grid = self.grid_visible and self.scheduler.grid_allowed()
+            self.hud.draw(frame, grid, self.roi_zone, self.red_zones, self.amber_zones, rects, self.mode,
+                          self.is_recording,
+                          f"LAT {self.last_latency_ms:.0f}ms  DROP {self.frames_dropped}  "
+                          f"LVL {self.scheduler.level}  MISS {self.scheduler.misses}")
+            t = self.scheduler.lap("hud", t)
+
+            if self.scheduler.run_preview():
+                self.display.submit(frame)
+            t = self.scheduler.lap("preview", t)
+            # Sin sleep fijo: read() ya espera al siguiente frame de la cámara
+            self.scheduler.end_frame((t - loop_t) * 1000)
+            self.scheduler.lap("loop", loop_t)
+            metrics.inc("frames")
+            metrics.set("loop_fps", round(self.loop_fps, 1))
+            metrics.set("mode", self.mode)
+            metrics.set("status", self.last_status)
+
+    def combine_extra_cameras(self, status, frame, capture_ts):
+        """Peor estado entre `status` (principal) y las cámaras adicionales.
+
+        Devuelve (estado, frame para la foto de alarma, captura del frame que
+        decide). Si decide una cámara adicional, su captura; si es una cámara
+        perdida (sin frame que la respalde), el momento actual.
+        """
+        if not self.multicam:
+            return status, frame, capture_ts
+        self.multicam.poll()
+        cam_status = self.multicam.combined_status()
+        if self.mode == "AUTOMATICO" and SEVERITY[cam_status] > SEVERITY[status]:
+            status = cam_status
+            capture_ts = self.multicam.capture_ts(cam_status) or time.monotonic()
+            danger_frame, danger_cam = self.multicam.take_danger_frame()
+            if danger_frame is not None:
+                frame = danger_frame
+                self.log_event(f"📹 Intrusión detectada por {danger_cam}", "DANGER", danger_cam)
+        return status, frame, capture_ts
+
+    def check_extra_cameras(self):
+        """Pasada sin frame de la principal: decide solo con las cámaras adicionales.
+
+        La principal cuenta con su último estado mientras sea reciente (el
+        temporizador ámbar no se reinicia entre frames) y como SAFE si está caída.
+        """
+        fresh = time.monotonic() - self.primary_ts < self.PRIMARY_STALE_S
+        primary = self.primary_status if fresh else "SAFE"
+        self.decision_t = time.perf_counter()
+        status, alarm_frame, self.capture_ts = \
+            self.combine_extra_cameras(primary, self.last_frame, self.primary_ts if fresh else time.monotonic())
+        if alarm_frame is None:
+            alarm_frame = np.zeros((484, 860, 3), np.uint8)
+        self.handle_security_logic(status, alarm_frame)
+
+    def start_multicam(self):
+        """Arranca los procesos de las cámaras adicionales si hay alguna configurada."""
+        if not self.extra_cameras:
+            return
+        self.multicam = MultiCameraEngine(self.extra_cameras, on_event=self.log_event).start()
+        self.push_multicam_mode()
+        self.log_event(f"📹 Multicámara: {len(self.extra_cameras)} cámaras en {self.multicam.workers} procesos")
+        self.refresh_multicam_stats()
 
-            if self.is_recording:
-                cv2.putText(frame, "REC", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2, cv2.LINE_AA)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            self.photo = ImageTk.PhotoImage(image=Image.fromarray(frame_rgb))
-            self.after(0, self.draw_frame)
-            time.sleep(0.01)
-
-    def draw_frame(self):
-        self.canvas.itemconfig(self.video_bg_id, image=self.photo)
-        self.canvas.tag_lower("bg_video")
-        if self.last_status == "DANGER" or self.mode == "EMERGENCIA":
-            self.canvas.delete("danger_overlay")
-            self.canvas.create_rectangle(0, 0, 860, 484, fill="red", stipple="gray25", tags="danger_overlay")
-        else:
-            self.canvas.delete("danger_overlay")
+    def start_plc(self):
+        if not self.plc_endpoint:
+            return
+        self.plc = PLCBridge(
+            self.plc_endpoint, deadline_ms=self.plc_deadline_ms, on_event=self.log_event,
+            on_mode=lambda mode: self.log_event(f"🏭 PLC: máquina en modo {mode}", "PLC_MODE", "PLC")
+        ).start()
+
+    def push_multicam_mode(self):
+        if self.multicam:
+            self.multicam.set_mode(self.mode)
+
+    def refresh_multicam_stats(self):
+        if self.multicam:
+            self.lbl_multicam.configure(text=self.multicam.summary_lines())
+            self.after(1000, self.refresh_multicam_stats)
 
     # ─────────────────────────────── SEGURIDAD ───────────────────────────────
 
     def process_security(self, frame):
-        fg_mask = self.back_sub.apply(frame)
-        _, fg_mask = cv2.threshold(fg_mask, 250, 255, cv2.THRESH_BINARY)
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-
-        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        rects, final_status = [], "SAFE"
-
-        if self.roi_zone:
-            rx1, ry1, rx2, ry2 = self.roi_zone
-            for cnt in contours:
-                if cv2.contourArea(cnt) > 500:
-                    mx, my, mw, mh = cv2.boundingRect(cnt)
-                    if rx1 < mx + mw / 2 < rx2 and ry1 < my + mh / 2 < ry2:
-                        rects.append((mx, my, mw, mh))
-                        for z in self.red_zones:
-                            if self.intersect((mx, my, mx + mw, my + mh), z):
-                                return "DANGER", rects
-                        for z in self.amber_zones:
-                            if self.intersect((mx, my, mx + mw, my + mh), z):
-                                final_status = "WARNING"
-        return final_status, rects
-
-    def intersect(self, r1, r2):
-        return not (r1[2] < r2[0] or r1[0] > r2[2] or r1[3] < r2[1] or r1[1] > r2[3])
+        return self.motion.process(frame)
+
+    def sync_zones(self):
+        """Pasa las zonas actuales al pipeline de movimiento (sin reiniciar el fondo).
+
+        Solo desde el hilo de vídeo (o antes de arrancarlo): el pipeline no se
+        toca desde Tk, los cambios llegan por `_pending_layout`.
+        """
+        self.motion.set_zones(self.roi_zone, self.red_zones, self.amber_zones, keep_background=True)
+
+    def publish_layout(self, changes):
+        """Cambio hecho aquí → layout compartido (escritura diferida y atómica).
+
+        Solo viaja lo que se ha tocado: los polígonos del editor web que no
+        cambian se conservan tal cual en vez de guardarse como rectángulos.
+        La suscripción deja el layout en `_pending_layout` y el hilo de vídeo
+        lo aplica al pipeline en su próxima pasada.
+        """
+        self.layout.update(changes, self.layout_source)
+
+    def apply_layout(self, layout):
+        """Layout → zonas de la cámara principal. Las cámaras adicionales no lo
+        siguen: cada una ve otra escena y tiene sus propias zonas en "cameras"."""
+        self.roi_zone, self.red_zones, self.amber_zones = rects_from_layout(layout, (860, 484))
+        self.sync_zones()
+
+    def on_layout_changed(self, layout):
+        """Cambio del layout, propio o de otro proceso (p. ej. el editor web)."""
+        self._pending_layout = layout
+        if layout.get("updated_by") == self.layout_source:
+            return  # dibujado aquí: el lienzo ya lo muestra
+        self.ui.call(self.canvas.delete, "fixed_zone")
+        self.log_event(f"🗺 Layout v{layout['version']} recibido de {layout.get('updated_by')}", "LAYOUT")
 
     def handle_security_logic(self, status, frame):
         if self.mode != "AUTOMATICO":
             return
         if status == "DANGER":
+            # Primero el PLC: GUI, grabación y email van después y no lo retrasan
+            if self.plc:
+                self.plc.emergency_stop(self.capture_ts)
             self.amber_timer_start = None
             self.amber_critical_triggered = False
             self.mode = "EMERGENCIA"
-            self.mode_selector.set("STOP")
-            self.mode_selector.configure(state="disabled")
-            self.btn_reset.configure(state="normal", fg_color="#E74C3C")
-            self.after(0, lambda: self.status_indicator.configure(text="🔴 EMERGENCIA ACTIVA", text_color="#E74C3C"))
+            self.push_multicam_mode()
+            self.ui.call(self.lock_controls_for_emergency)
+            self.set_status_indicator("🔴 EMERGENCIA ACTIVA", "#E74C3C")
             self.trigger_recording(frame)
             self.play_siren("EMERGENCY")
             self.send_email_alert("INTRUSIÓN CRÍTICA EN ZONA ROJA")
-            self.log_event("!!! INTRUSIÓN CRÍTICA - SISTEMA BLOQUEADO !!!")
-            self.after(500, self.ask_feedback)
+            self.log_event("!!! INTRUSIÓN CRÍTICA - SISTEMA BLOQUEADO !!!", "DANGER", "ROJA")
+            metrics.lap("detection_to_alarm", self.decision_t)
+            metrics.inc("alarms")
         elif status == "WARNING":
             # Iniciar temporizador de zona ámbar
             if self.amber_timer_start is None:
                 self.amber_timer_start = time.time()
                 self.play_siren("WARNING")
-                self.log_event("⚠ Alerta: Movimiento en zona ÁMBAR — temporizador iniciado")
-                self.after(0, lambda: self.status_indicator.configure(text="🟡 ALERTA - ZONA ÁMBAR", text_color="#F39C12"))
+                self.log_event("⚠ Alerta: Movimiento en zona ÁMBAR — temporizador iniciado", "WARNING", "ÁMBAR")
+                self.set_status_indicator("🟡 ALERTA - ZONA ÁMBAR", "#F39C12")
             # Escalar a sirena crítica si lleva >= 10s en zona ámbar
             elapsed = time.time() - self.amber_timer_start
             if elapsed >= self.AMBER_CRITICAL_SECONDS and not self.amber_critical_triggered:
                 self.amber_critical_triggered = True
                 self.play_siren("AMBER_CRITICAL")
-                self.log_event(f"🔥 ALERTA CRÍTICA: {int(elapsed)}s en zona ÁMBAR — sirena de máxima urgencia")
-                self.after(0, lambda: self.status_indicator.configure(text="🔥 ZONA ÁMBAR CRÍTICA", text_color="#FF6B00"))
+                self.log_event(f"🔥 ALERTA CRÍTICA: {int(elapsed)}s en zona ÁMBAR — sirena de máxima urgencia",
+                               "AMBER_CRITICAL", "ÁMBAR")
+                self.set_status_indicator("🔥 ZONA ÁMBAR CRÍTICA", "#FF6B00")
         elif status == "SAFE":
             if self.last_status != "SAFE":
-                self.after(0, lambda: self.status_indicator.configure(text="🟢 VIGILANDO", text_color="#27AE60"))
+                self.set_status_indicator("🟢 VIGILANDO", "#27AE60")
             # Resetear temporizador ámbar al salir de la zona
             self.amber_timer_start = None
             self.amber_critical_triggered = False
+        if self.plc and status != self.last_status:
+            self.plc.set_status(status)
         self.last_status = status
 
+    def set_status_indicator(self, text, color):
+        """Desde cualquier hilo: solo se pinta el último estado de cada tick."""
+        self.ui.post("status", self.status_indicator.configure, text=text, text_color=color)
+
+    def lock_controls_for_emergency(self):
+        self.mode_selector.set("STOP")
+        self.mode_selector.configure(state="disabled")
+        self.btn_reset.configure(state="normal", fg_color="#E74C3C")
+        self.after(500, self.ask_feedback)
+
     def ask_feedback(self):
         respuesta = messagebox.askyesno(
             "Confirmación de IA",
@@ -376,23 +574,17 @@ class AntiNapasApp(ctk.CTk):
             self.confirmed_anomalies += 1
             self.last_intrusion_time = datetime.datetime.now().strftime("%H:%M:%S del %d/%m/%Y")
             self.log_event(f"✔ Anomalía confirmada (Total: {self.confirmed_anomalies})")
+            self.captures.set_verdict([self.last_capture_path, self.recording_path], "confirmed")
         else:
             self.false_alarms += 1
-            for path in [self.last_capture_path, self.recording_path]:
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except Exception:
-                        pass
+            # Se borran en cuanto terminen de escribirse (el clip puede seguir abierto)
+            self.captures.set_verdict([self.last_capture_path, self.recording_path], "false")
             old = self.anomaly_threshold
             self.anomaly_threshold = int(self.anomaly_threshold * 1.15)
             self.log_event(f"🧠 Aprendizaje: umbral {old} → {self.anomaly_threshold}")
             messagebox.showinfo("IA Actualizada", "Entendido. He ajustado mi sensibilidad.")
 
-        self.event_history.append([
-            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            f"Intrusión - {'Confirmada' if respuesta else 'Falsa alarma'}"
-        ])
+        self.events.add(f"Intrusión - {'Confirmada' if respuesta else 'Falsa alarma'}", "FEEDBACK", "ROJA")
         self.update_stats_display()
         self.save_settings()
 
@@ -430,45 +622,46 @@ class AntiNapasApp(ctk.CTk):
 
     def safety_reset(self):
         self.mode = "AUTOMATICO"
+        self.push_multicam_mode()
         self.last_status = "SAFE"
         self.mode_selector.configure(state="normal")
         self.mode_selector.set("AUTOMATICO")
         self.btn_reset.configure(state="disabled", fg_color="#27AE60")
-        self.status_indicator.configure(text="🟢 VIGILANDO", text_color="#27AE60")
+        self.set_status_indicator("🟢 VIGILANDO", "#27AE60")
+        if self.plc:
+            self.plc.reset_emergency()
         self.log_event("✅ Rearme completado. Sistema en modo AUTOMÁTICO.")
         messagebox.showinfo("Rearme", "Seguridad rearmada. Sistema activo en modo AUTOMÁTICO.")
 
     # ─────────────────────────── GRABACIÓN / AUDIO ───────────────────────────
 
     def trigger_recording(self, frame):
-        timestamp = int(time.time())
-        if not os.path.exists("captures"):
-            os.makedirs("captures")
-
-        # Foto de captura
-        self.last_capture_path = f"captures/EMERGENCIA_{timestamp}.jpg"
-        cv2.imwrite(self.last_capture_path, frame)
-
-        # Grabación de vídeo (10 s)
-        self.recording_path = f"captures/GRABACION_{timestamp}.avi"
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        self.video_writer = cv2.VideoWriter(self.recording_path, fourcc, 20.0, (860, 484))
+        # Rutas en la carpeta del día, ya registradas en el índice de capturas
+        self.last_capture_path, self.recording_path = self.captures.new_capture(zone="ROJA", status="DANGER")
+
+        # Foto de captura (se escribe en segundo plano; la miniatura llega por callback)
+        self.capture_writer.snapshot(self.last_capture_path, frame)
+
+        # Grabación de vídeo: segundos previos del buffer + 10 s posteriores,
+        # a la cadencia real del bucle (no a 20 fps fijos)
+        pre_frames = self.pre_buffer.snapshot()
+        fps = min(30.0, max(5.0, self.loop_fps or 20.0))
+        self.capture_writer.start_clip(self.recording_path, (860, 484), fps, pre_frames)
         self.is_recording = True
         self.recording_start_time = time.time()
-        self.after(0, lambda: self.lbl_rec_status.configure(text="⬤ Grabando emergencia..."))
+        self.ui.post("rec_status", self.lbl_rec_status.configure, text="⬤ Grabando emergencia...")
+        self.log_event(f"📸 Foto: {self.last_capture_path}")
+        self.log_event(f"🎥 Grabando vídeo: {self.recording_path} (+{len(pre_frames)} frames previos)")
 
-        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).resize((200, 112))
-        ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(200, 112))
+    def show_last_capture(self, rgb):
+        img = Image.fromarray(rgb)
+        ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
         self.last_capture_label.configure(image=ctk_img, text="")
-        self.log_event(f"📸 Foto: {self.last_capture_path}")
-        self.log_event(f"🎥 Grabando vídeo: {self.recording_path}")
 
     def stop_recording(self):
-        if self.video_writer:
-            self.video_writer.release()
-            self.video_writer = None
+        self.capture_writer.stop_clip()
         self.is_recording = False
-        self.after(0, lambda: self.lbl_rec_status.configure(text="✅ Grabación finalizada"))
+        self.ui.post("rec_status", self.lbl_rec_status.configure, text="✅ Grabación finalizada")
         self.log_event(f"🎥 Vídeo guardado: {self.recording_path}")
 
     def play_siren(self, siren_type):
@@ -501,16 +694,29 @@ class AntiNapasApp(ctk.CTk):
     def save_settings(self):
         settings = {
             "threshold": self.anomaly_threshold,
-            "roi": self.roi_zone,
-            "red_zones": self.red_zones,
-            "amber_zones": self.amber_zones,
             "confirmed_anomalies": self.confirmed_anomalies,
             "false_alarms": self.false_alarms,
+            "cameras": self.extra_cameras,
+            "motion_crop_roi": self.motion_crop_roi,
+            "motion_scale": self.motion_scale,
+            "motion_backend": self.motion_backend,
+            "motion_backend_params": self.motion_backend_params,
+            "motion_learning_rates": self.motion_learning_rates,
+            "prebuffer_seconds": self.prebuffer_seconds,
+            "prebuffer_mb": self.prebuffer_mb,
+            "preview_fps": self.preview_fps,
+            "frame_budget_ms": self.frame_budget_ms,
+            "capture_max_age_days": self.capture_max_age_days,
+            "capture_max_gb": self.capture_max_gb,
+            "plc_endpoint": self.plc_endpoint,
+            "plc_deadline_ms": self.plc_deadline_ms,
         }
         if not os.path.exists("logs"):
             os.makedirs("logs")
-        with open("logs/factory_settings.json", "w") as f:
+        # Escritura atómica: un cierre a mitad nunca deja el fichero corrupto
+        with open("logs/factory_settings.json.tmp", "w") as f:
             json.dump(settings, f, indent=2)
+        os.replace("logs/factory_settings.json.tmp", "logs/factory_settings.json")
 
     def save_settings_manual(self):
         self.save_settings()
@@ -523,12 +729,34 @@ class AntiNapasApp(ctk.CTk):
                 with open(path, "r") as f:
                     d = json.load(f)
                 self.anomaly_threshold = d.get("threshold", 1200)
-                self.roi_zone = d.get("roi")
-                self.red_zones = d.get("red_zones", [])
-                self.amber_zones = d.get("amber_zones", [])
+                # Zonas de versiones anteriores (en este fichero) → layout compartido
+                if self.layout.version == 0 and (d.get("roi") or d.get("red_zones") or d.get("amber_zones")):
+                    self.layout.update(layout_from_rects(d.get("roi"), d.get("red_zones", []),
+                                                         d.get("amber_zones", []), (860, 484)), self.layout_source)
                 self.confirmed_anomalies = d.get("confirmed_anomalies", 0)
                 self.false_alarms = d.get("false_alarms", 0)
+                self.extra_cameras = d.get("cameras", [])
+                self.motion_crop_roi = d.get("motion_crop_roi", True)
+                self.motion_scale = d.get("motion_scale", 1.0)
+                self.motion_backend = d.get("motion_backend", DEFAULT_BACKEND)
+                self.motion_backend_params = d.get("motion_backend_params", {})
+                self.motion_learning_rates = d.get("motion_learning_rates", {})
+                self.motion = MotionPipeline(crop_to_roi=self.motion_crop_roi, scale=self.motion_scale,
+                                             backend=self.motion_backend, backend_params=self.motion_backend_params,
+                                             schedule=LearningSchedule(self.motion_learning_rates))
+                self.prebuffer_seconds = d.get("prebuffer_seconds", 5)
+                self.prebuffer_mb = d.get("prebuffer_mb", 32)
+                self.preview_fps = d.get("preview_fps", 15)
+                self.frame_budget_ms = d.get("frame_budget_ms", 50)
+                self.capture_max_age_days = d.get("capture_max_age_days", 30)
+                self.capture_max_gb = d.get("capture_max_gb", 20.0)
+                self.plc_endpoint = d.get("plc_endpoint")
+                self.plc_deadline_ms = d.get("plc_deadline_ms", 100)
+                self.pre_buffer = PreEventBuffer(self.prebuffer_seconds, self.prebuffer_mb * 1024 * 1024)
                 self.log_event(f"⚙ Config cargada: umbral={self.anomaly_threshold}, anomalías={self.confirmed_anomalies}, falsas={self.false_alarms}")
+                if self.motion_scale < 1.0:
+                    self.log_event(f"⚠ motion_scale={self.motion_scale}: modo reducido experimental, "
+                                   f"validar con verify_motion_pipeline.py", "WARNING")
                 self.after(150, self.update_stats_display)
             except Exception as e:
                 self.log_event(f"Error al cargar ajustes: {e}")
@@ -557,9 +785,7 @@ class AntiNapasApp(ctk.CTk):
                 self.camera_source = url
         else:
             self.camera_source = int(choice.split()[-1])
-        self.video_running = False
-        time.sleep(0.3)
-        self.cap.release()
+        self.stop_camera()
         self.start_camera()
         self.log_event(f"📷 Fuente: {self.camera_source}")
 
@@ -593,19 +819,21 @@ class AntiNapasApp(ctk.CTk):
                         messagebox.showwarning("Fuera de ROI", "La zona debe estar dentro del ROI.")
                         is_valid = False
             if is_valid:
-                if self.drawing_type == "RED":
-                    self.red_zones.append((x1, y1, x2, y2))
-                elif self.drawing_type == "AMBER":
-                    self.amber_zones.append((x1, y1, x2, y2))
-                elif self.drawing_type == "ROI":
+                if self.drawing_type == "ROI":
                     self.roi_zone = (x1, y1, x2, y2)
                     self.red_zones, self.amber_zones = [], []
                     self.canvas.delete("fixed_zone")
                     self.log_event("Nuevo ROI. Zonas anteriores eliminadas.")
+                    changes = {"roi": rect_to_points(self.roi_zone, (860, 484)), "zones": []}
+                else:
+                    (self.red_zones if self.drawing_type == "RED" else self.amber_zones).append((x1, y1, x2, y2))
+                    zone = zone_from_rect(self.drawing_type, (x1, y1, x2, y2), (860, 484))
+                    # Se añade a las zonas que haya en ese momento (también las del editor web)
+                    changes = lambda layout: {"zones": layout["zones"] + [zone]}
                 color_map = {"RED": "#C0392B", "AMBER": "#D4AC0D", "ROI": "#1F6FEB"}
                 self.canvas.create_rectangle(x1, y1, x2, y2, outline=color_map[self.drawing_type], width=2, tags="fixed_zone")
                 self.log_event(f"✅ Zona {self.drawing_type} creada.")
-                self.save_settings()
+                self.publish_layout(changes)
         self.canvas.delete("temp_rect")
         self.rect_id = self.drawing_type = None
 
@@ -614,22 +842,23 @@ class AntiNapasApp(ctk.CTk):
 
     def change_mode(self, mode):
         self.mode = mode
+        self.push_multicam_mode()
         colors = {"AUTOMATICO": ("🟢 VIGILANDO", "#27AE60"), "CALIBRACION": ("🔵 CALIBRANDO", "#3498DB"), "STOP": ("⚪ SISTEMA PARADO", "#888888")}
         text, color = colors.get(mode, ("⚪ SISTEMA PARADO", "#888888"))
-        self.status_indicator.configure(text=text, text_color=color)
+        self.set_status_indicator(text, color)
         if mode == "CALIBRACION":
-            self.back_sub = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=50, detectShadows=True)
+            self.motion.reset_background()
             self.log_event("📷 Calibrando fondo... (mantén la escena vacía 10s)")
         self.log_event(f"Sistema → {mode}")
 
-    def log_event(self, msg):
+    def log_event(self, msg, event_type="INFO", zone=None):
+        """Seguro desde cualquier hilo: consola vía bus, registro vía EventStore."""
         ts = time.strftime('%H:%M:%S')
-        self.console.insert("end", f"[{ts}] {msg}\n")
-        self.console.see("end")
-        self.event_history.append([datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), msg])
+        self.ui.log(f"[{ts}] {msg}")
+        self.events.add(msg, event_type, zone)
 
     def export_report(self):
-        if not self.event_history:
+        if not self.events.count():
             messagebox.showwarning("Informe", "No hay eventos para exportar.")
             return
         file_path = filedialog.asksaveasfilename(
@@ -639,9 +868,8 @@ class AntiNapasApp(ctk.CTk):
         )
         if file_path:
             try:
-                with open(file_path, mode='w', newline='', encoding='utf-8') as f:
-                    csv.writer(f).writerows([["Fecha y Hora", "Evento"]] + self.event_history)
-                messagebox.showinfo("Éxito", f"Informe exportado:\n{file_path}")
+                n = self.events.export_csv(file_path)
+                messagebox.showinfo("Éxito", f"Informe exportado ({n} eventos):\n{file_path}")
                 self.log_event(f"📊 Informe exportado.")
             except Exception as e:
                 messagebox.showerror("Error", str(e))
@@ -649,17 +877,23 @@ class AntiNapasApp(ctk.CTk):
     def clear_all(self):
         self.red_zones, self.amber_zones, self.roi_zone = [], [], None
         self.canvas.delete("fixed_zone")
-        self.save_settings()
+        self.publish_layout({"roi": None, "zones": []})
         self.log_event("🗑 Todas las zonas eliminadas.")
 
     def on_closing(self):
-        self.video_running = False
         if self.is_recording:
             self.stop_recording()
-        time.sleep(0.3)
-        if hasattr(self, 'cap'):
-            self.cap.release()
+        self.stop_camera()
+        self.ui.stop()
+        self.capture_writer.close()
+        self.captures.close()
+        self.layout.close()
+        if self.multicam:
+            self.multicam.stop()
+        if self.plc:
+            self.plc.stop()
         self.save_settings()
+        self.events.close()
         self.destroy()
 
 
@@ -669,53 +903,24 @@ class AntiNapasApp(ctk.CTk):
         """Prueba si la fuente de vídeo seleccionada responde correctamente."""
         def _test():
             src = self.camera_source
-            self.after(0, lambda: self.lbl_cam_ok.configure(text="...", text_color="#888"))
+            self.ui.post("cam_ok", self.lbl_cam_ok.configure, text="...", text_color="#888")
             cap = cv2.VideoCapture(src)
             ok = cap.isOpened()
             cap.release()
             if ok:
-                self.after(0, lambda: self.lbl_cam_ok.configure(text="✅", text_color="#2ECC71"))
+                self.ui.post("cam_ok", self.lbl_cam_ok.configure, text="✅", text_color="#2ECC71")
                 self.log_event(f"✅ Cámara '{src}' detectada y funcional.")
             else:
-                self.after(0, lambda: self.lbl_cam_ok.configure(text="❌", text_color="#E74C3C"))
+                self.ui.post("cam_ok", self.lbl_cam_ok.configure, text="❌", text_color="#E74C3C")
                 self.log_event(f"❌ No se pudo conectar a la cámara '{src}'.")
         threading.Thread(target=_test, daemon=True).start()
 
     def show_captures_viewer(self):
-        """Ventana emergente con miniatura de todas las capturas guardadas."""
-        folder = "captures"
-        if not os.path.exists(folder):
-            messagebox.showinfo("Sin capturas", "La carpeta 'captures' aún no existe.")
-            return
-        files = sorted(
-            [f for f in os.listdir(folder) if f.lower().endswith((".jpg", ".jpeg", ".png"))],
-            reverse=True
-        )
-        if not files:
-            messagebox.showinfo("Sin capturas", "No hay imágenes en la carpeta 'captures'.")
-            return
-
-        win = ctk.CTkToplevel(self)
-        win.title("🖼 Visor de Capturas de Emergencia")
-        win.geometry("800x520")
+        """Ventana emergente con las miniaturas de las capturas, por páginas."""
+        # El listado (índice) y las miniaturas se cargan en segundo plano dentro del visor
+        win = CapturesViewer(self, self.ui, self.captures.snapshot_paths)
         win.grab_set()
 
-        scroll = ctk.CTkScrollableFrame(win, fg_color="#0d1117")
-        scroll.pack(fill="both", expand=True, padx=10, pady=10)
-
-        cols = 4
-        for idx, fname in enumerate(files):
-            path = os.path.join(folder, fname)
-            try:
-                img = Image.open(path).resize((170, 96))
-                ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(170, 96))
-                cell = ctk.CTkFrame(scroll, fg_color="#161B22", corner_radius=6)
-                cell.grid(row=idx // cols, column=idx % cols, padx=6, pady=6)
-                ctk.CTkLabel(cell, image=ctk_img, text="").pack(padx=4, pady=(4, 0))
-                ctk.CTkLabel(cell, text=fname[:22], font=("Consolas", 8), text_color="#888").pack(pady=(0, 4))
-            except Exception:
-                pass
-
     def send_email_alert(self, motivo: str):
         """Envía alerta por email si EMAIL_ENABLED es True y la config es válida."""
         if not self.EMAIL_ENABLED or not self.EMAIL_PASS:
@@ -0,0 +1,183 @@
+# =============================================================================
+# AntiÑapas-Pons: Métricas de latencia de bajo coste
+# Desc.  : Histogramas de cubetas fijas (escala logarítmica) para los tiempos
+#          por etapa del bucle de detección, más contadores y medidores.
+#          Registrar una muestra es un bisect + una suma bajo lock (~1 µs),
+#          así que puede quedarse activo en producción. El bucle exporta una
+#          instantánea JSON periódica que sirve app_web (/api/metrics).
+# =============================================================================
+
+import bisect
+import json
+import os
+import threading
+import time
+
+# Límites superiores de cubeta en ms: 0.05 ms … ~10 s, razón 1.25
+BUCKETS_MS = []
+_b = 0.05
+while _b < 10000:
+    BUCKETS_MS.append(round(_b, 4))
+    _b *= 1.25
+BUCKETS_MS.append(float("inf"))
+
+METRICS_FILE = os.path.join("logs", "metrics.json")
+
+
+class LatencyHistogram:
+    """Histograma acumulado (para Prometheus) + ventana deslizante (para el panel)."""
+
+    def __init__(self, window_s=60.0):
+        n = len(BUCKETS_MS)
+        self.total = [0] * n
+        self.cur = [0] * n
+        self.prev = [0] * n
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.window_s = window_s
+        self.window_start = time.monotonic()
+
+    def observe(self, ms):
+        i = bisect.bisect_left(BUCKETS_MS, ms)
+        self.total[i] += 1
+        self.cur[i] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def _rotate(self, now):
+        if now - self.window_start >= self.window_s:
+            self.prev, self.cur = self.cur, [0] * len(BUCKETS_MS)
+            self.window_start = now
+
+    def percentile(self, q, counts):
+        n = sum(counts)
+        if not n:
+            return 0.0
+        target = q * n
+        acc = 0
+        for bound, c in zip(BUCKETS_MS, counts):
+            acc += c
+            if acc >= target:
+                return bound if bound != float("inf") else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        self._rotate(time.monotonic())
+        recent = [a + b for a, b in zip(self.cur, self.prev)]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50, recent),
+            "p95_ms": self.percentile(0.95, recent),
+            "p99_ms": self.percentile(0.99, recent),
+        }
+
+
+class MetricsRegistry:
+    """Registro de histogramas, contadores y medidores compartido por los hilos."""
+
+    def __init__(self, prefix="antinapas"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._exporter = None
+
+    # ────────────────────────────── REGISTRO ─────────────────────────────────
+
+    def observe(self, name, ms):
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = LatencyHistogram()
+            h.observe(ms)
+
+    def lap(self, name, t0):
+        """Registra la etapa `name` desde t0 (perf_counter) y devuelve el instante actual."""
+        now = time.perf_counter()
+        self.observe(name, (now - t0) * 1000)
+        return now
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    # ────────────────────────────── LECTURA ──────────────────────────────────
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "stages": {k: h.summary() for k, h in self.histograms.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+
+    def prometheus_text(self):
+        with self._lock:
+            return prometheus_from(self.prefix, {
+                "histograms": {k: (list(h.total), h.count, h.sum_ms) for k, h in self.histograms.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            })
+
+    # ────────────────────────────── EXPORTAR ─────────────────────────────────
+
+    def export_json(self, path=METRICS_FILE):
+        """Escritura atómica de la instantánea (la lee app_web)."""
+        data = self.snapshot()
+        with self._lock:
+            data["buckets"] = {k: list(h.total) for k, h in self.histograms.items()}
+            data["sums"] = {k: h.sum_ms for k, h in self.histograms.items()}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path=METRICS_FILE, interval=1.0):
+        """Hilo que vuelca la instantánea cada `interval` s fuera del bucle de detección."""
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export_json(path)
+                except OSError:
+                    pass
+        self._exporter = threading.Thread(target=_run, daemon=True)
+        self._exporter.start()
+
+
+def prometheus_from(prefix, data):
+    """Formato de exposición de texto de Prometheus a partir de cubetas acumuladas."""
+    lines = []
+    name = f"{prefix}_stage_latency_ms"
+    lines.append(f"# TYPE {name} histogram")
+    for stage, (buckets, count, total) in data.get("histograms", {}).items():
+        acc = 0
+        for bound, c in zip(BUCKETS_MS, buckets):
+            acc += c
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {acc}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total:.3f}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+    for key, val in data.get("counters", {}).items():
+        lines.append(f"# TYPE {prefix}_{key}_total counter")
+        lines.append(f"{prefix}_{key}_total {val}")
+    for key, val in data.get("gauges", {}).items():
+        if isinstance(val, (int, float)):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {val}")
+    return "\n".join(lines) + "\n"
+
+
+# Registro por defecto del proceso
+registry = MetricsRegistry()
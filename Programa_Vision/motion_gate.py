@@ -0,0 +1,107 @@
+# =============================================================================
+# AntiÑapas-Pons: Compuerta de movimiento para el detector de personas
+# Desc.  : Sustractor de fondo barato a resolución reducida (MOG2 sin sombras)
+#          que decide DÓNDE merece la pena ejecutar el detector caro (HOG o
+#          MediaPipe). Devuelve recortes ampliados alrededor del primer plano
+#          en coordenadas del frame; en escenas estáticas no devuelve nada y
+#          el detector ni se ejecuta. Las cajas de las últimas personas
+#          detectadas se mantienen como regiones para no perder a alguien que
+#          se queda quieto dentro de una zona.
+# =============================================================================
+
+import cv2
+
+
+def merge_boxes(boxes):
+    """Une cajas (x1, y1, x2, y2) que se solapan hasta que no quede ninguna solapada."""
+    boxes = [list(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        while boxes:
+            a = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                b = boxes[i]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    a = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            out.append(a)
+        boxes = out
+    return [tuple(b) for b in boxes]
+
+
+class MotionGate:
+    """Regiones del frame con movimiento (o con personas recientes)."""
+
+    def __init__(self, scale=0.25, min_area_ratio=0.0015, expand=0.35, min_size=(96, 160),
+                 hold_frames=15, history=300, var_threshold=25):
+        self.scale = scale
+        self.min_area_ratio = min_area_ratio  # fracción del frame para considerar movimiento
+        self.expand = expand                  # margen alrededor de cada mancha
+        self.min_size = min_size              # recorte mínimo (el HOG necesita 64x128 + margen)
+        self.hold_frames = hold_frames        # frames que se sigue mirando donde hubo personas
+        self.back_sub = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold,
+                                                           detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.mask = None        # máscara de primer plano a resolución reducida
+        self._shape = None
+        self._held = []         # [(caja, frames restantes)]
+        self.frames = 0
+        self.frames_gated = 0   # frames en los que no hizo falta el detector
+
+    @property
+    def fg_mask(self):
+        """Máscara de primer plano a tamaño de frame (para la anonimización)."""
+        if self.mask is None or self._shape is None:
+            return None
+        return cv2.resize(self.mask, (self._shape[1], self._shape[0]), interpolation=cv2.INTER_NEAREST)
+
+    def hold(self, boxes):
+        """Registra cajas (x, y, w, h) de personas detectadas en el frame actual."""
+        for x, y, w, h in boxes:
+            self._held.append(((x, y, x + w, y + h), self.hold_frames))
+
+    def _expand(self, box, w, h):
+        x1, y1, x2, y2 = box
+        bw, bh = x2 - x1, y2 - y1
+        mx, my = int(bw * self.expand), int(bh * self.expand)
+        # Ampliar hasta el tamaño mínimo alrededor del centro
+        mx = max(mx, (self.min_size[0] - bw) // 2)
+        my = max(my, (self.min_size[1] - bh) // 2)
+        return max(0, x1 - mx), max(0, y1 - my), min(w, x2 + mx), min(h, y2 + my)
+
+    def regions(self, frame):
+        """Recortes (x1, y1, x2, y2) a procesar en este frame; [] si la escena está quieta."""
+        h, w = frame.shape[:2]
+        self._shape = (h, w)
+        self.frames += 1
+        small = cv2.resize(frame, (max(1, int(w * self.scale)), max(1, int(h * self.scale))),
+                           interpolation=cv2.INTER_AREA)
+        mask = self.back_sub.apply(small)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        self.mask = mask
+
+        boxes = []
+        min_area = self.min_area_ratio * mask.size
+        if cv2.countNonZero(mask) >= min_area:
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            inv = 1.0 / self.scale
+            for c in contours:
+                if cv2.contourArea(c) < min_area / 4:
+                    continue
+                x, y, bw, bh = cv2.boundingRect(c)
+                boxes.append((int(x * inv), int(y * inv), int((x + bw) * inv), int((y + bh) * inv)))
+
+        # Personas recientes: se siguen mirando aunque ya no se muevan
+        boxes += [b for b, _ in self._held]
+        self._held = [(b, n - 1) for b, n in self._held if n > 1]
+
+        if not boxes:
+            self.frames_gated += 1
+            return []
+        return merge_boxes([self._expand(b, w, h) for b in boxes])
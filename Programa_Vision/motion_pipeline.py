@@ -0,0 +1,167 @@
+# =============================================================================
+# AntiÑapas-Pons: Pipeline de movimiento y zonas por cámara
+# Desc.  : Sustracción de fondo (MOG2 u otro de bg_models) + contornos + clasificación en zonas
+#          ROI / ROJA / ÁMBAR. Cada cámara tiene su propia instancia, con su
+#          propio modelo de fondo y sus propias zonas.
+# =============================================================================
+
+import cv2
+import numpy as np
+
+from bg_models import DEFAULT_BACKEND, LearningSchedule, create_backend
+from zone_raster import ZoneRaster
+
+# Prioridad de estados: el peor estado manda
+SEVERITY = {"SAFE": 0, "WARNING": 1, "DANGER": 2}
+
+
+def worst_status(statuses):
+    """Devuelve el estado más grave de una colección (SAFE si está vacía)."""
+    return max(statuses, key=lambda s: SEVERITY.get(s, 0), default="SAFE")
+
+
+class MotionPipeline:
+    """Detector de intrusiones basado en movimiento para UNA cámara.
+
+    Con `crop_to_roi` el modelo de fondo solo ve el recorte del ROI, y con
+    `scale` < 1 trabaja a resolución reducida (p.ej. 0.5 o 0.25). Las cajas
+    de movimiento se devuelven siempre en coordenadas de pantalla.
+    `scale` < 1 es EXPERIMENTAL: si algo se movía durante la calibración, el
+    modelo reducido no aprende lo mismo que el completo y el estado puede
+    diferir (~6 % de frames a 0.5 y ~16 % a 0.25 en el clip sintético de
+    bench_pipeline). Validar con verify_motion_pipeline.py en grabaciones del
+    puesto antes de activarlo; por defecto 1.0.
+    `backend` / `backend_params` eligen el modelo de fondo (ver bg_models) y
+    `schedule` su ritmo de aprendizaje en cada modo.
+    """
+
+    def __init__(self, roi_zone=None, red_zones=None, amber_zones=None, min_area=500,
+                 crop_to_roi=True, scale=1.0, backend=DEFAULT_BACKEND, backend_params=None, schedule=None):
+        self.min_area = min_area
+        self.backend = backend
+        self.backend_params = dict(backend_params or {})
+        self.schedule = schedule or LearningSchedule()
+        self.crop_to_roi = crop_to_roi
+        self.scale = scale
+        # El kernel de apertura se escala con la imagen para eliminar el mismo ruido
+        k = max(3, int(round(5 * scale)) | 1)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
+        self.fg_mask = None  # última máscara de primer plano (la usa la anonimización)
+        self._full_mask = None
+        self.roi_zone = None
+        self.model_roi = None  # recorte que ve el modelo de fondo (modo crop_to_roi)
+        self.reset_background()
+        self.set_zones(roi_zone, red_zones, amber_zones)
+
+    def reset_background(self):
+        """Nuevo modelo de fondo (modo CALIBRACION)."""
+        self.back_sub = create_backend(self.backend, **self.backend_params)
+        self.frames_since_reset = 0
+
+    def _apply(self, frame, mode, learning_rate=None):
+        if learning_rate is None:
+            learning_rate = self.schedule.rate(mode, self.frames_since_reset)
+        self.frames_since_reset += 1
+        return self.back_sub.apply(frame, learning_rate)
+
+    def set_zones(self, roi_zone, red_zones, amber_zones, keep_background=False):
+        """Cambia ROI y zonas. Con `keep_background` (cambio en caliente) el modelo
+        de fondo se conserva siempre que el nuevo ROI quepa en el recorte ya
+        modelado; solo un ROI que se sale de él obliga a empezar otro modelo."""
+        roi_zone = tuple(roi_zone) if roi_zone else None
+        if self.crop_to_roi and roi_zone != self.roi_zone:
+            m = self.model_roi
+            inside = (keep_background and roi_zone is not None and m is not None and
+                      m[0] <= roi_zone[0] and m[1] <= roi_zone[1] and roi_zone[2] <= m[2] and roi_zone[3] <= m[3])
+            if not inside:
+                # El recorte cambia de tamaño: el modelo anterior ya no sirve
+                self.reset_background()
+                self.model_roi = roi_zone
+        self.roi_zone = roi_zone
+        self.red_zones = [tuple(z) for z in (red_zones or [])]
+        self.amber_zones = [tuple(z) for z in (amber_zones or [])]
+        self.zone_raster = None  # se compila con el tamaño del primer frame
+        self.last_labels = np.zeros(0, np.uint8)  # etiqueta de zona de cada caja del último frame
+
+    def _raster(self, shape):
+        raster = self.zone_raster
+        if raster is None or raster.shape != shape[:2]:
+            raster = self.zone_raster = ZoneRaster.from_rects(shape, self.red_zones, self.amber_zones)
+        return raster
+
+    # ─────────────────────────── RECORTE / ESCALA ────────────────────────────
+
+    def _prepare(self, frame):
+        """Devuelve (imagen para el modelo, offset x, offset y)."""
+        ox = oy = 0
+        if self.crop_to_roi and self.model_roi:
+            rx1, ry1, rx2, ry2 = self.model_roi
+            ox, oy = max(0, rx1), max(0, ry1)
+            frame = frame[oy:max(oy, ry2), ox:max(ox, rx2)]
+        self._crop_size = (frame.shape[1], frame.shape[0])
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return frame, ox, oy
+
+    def _to_display(self, mask, frame_shape, ox, oy):
+        """Máscara de primer plano en coordenadas del frame completo."""
+        h, w = frame_shape[:2]
+        if mask.shape == (h, w):
+            return mask
+        if self._full_mask is None or self._full_mask.shape != (h, w):
+            self._full_mask = np.zeros((h, w), np.uint8)
+        else:
+            self._full_mask.fill(0)
+        tw, th = self._crop_size
+        if self.scale != 1.0:
+            mask = cv2.resize(mask, (tw, th), interpolation=cv2.INTER_NEAREST)
+        self._full_mask[oy:oy + th, ox:ox + tw] = mask
+        return self._full_mask
+
+    # ─────────────────────────────── PROCESO ─────────────────────────────────
+
+    def learn(self, frame, learning_rate=None, mode="CALIBRACION"):
+        """Actualiza el fondo sin evaluar zonas (CALIBRACION / STOP)."""
+        small, ox, oy = self._prepare(frame)
+        mask = self._apply(small, mode, learning_rate)
+        self.fg_mask = self._to_display(mask, frame.shape, ox, oy)
+
+    def step(self, frame, mode):
+        """Aplica al frame lo que corresponde según el modo de vigilancia."""
+        if mode == "AUTOMATICO":
+            return self.process(frame)
+        self.learn(frame, mode=mode)
+        return "SAFE", []
+
+    def process(self, frame, learning_rate=None):
+        small, ox, oy = self._prepare(frame)
+        fg_mask = self._apply(small, "AUTOMATICO", learning_rate)
+        _, fg_mask = cv2.threshold(fg_mask, 250, 255, cv2.THRESH_BINARY)
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel)
+        self.fg_mask = self._to_display(fg_mask, frame.shape, ox, oy)
+
+        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rects = []
+
+        if self.roi_zone:
+            rx1, ry1, rx2, ry2 = self.roi_zone
+            inv = 1.0 / self.scale
+            min_area = self.min_area * self.scale * self.scale
+            for cnt in contours:
+                if cv2.contourArea(cnt) > min_area:
+                    mx, my, mw, mh = cv2.boundingRect(cnt)
+                    # De vuelta a coordenadas de pantalla: los dos bordes se
+                    # redondean igual y el ancho sale de ellos
+                    x1, y1 = int(round(mx * inv)), int(round(my * inv))
+                    x2, y2 = int(round((mx + mw) * inv)), int(round((my + mh) * inv))
+                    mx, my, mw, mh = x1 + ox, y1 + oy, x2 - x1, y2 - y1
+                    if rx1 < mx + mw / 2 < rx2 and ry1 < my + mh / 2 < ry2:
+                        rects.append((mx, my, mw, mh))
+        if not rects:
+            self.last_labels = np.zeros(0, np.uint8)
+            return "SAFE", rects
+        # Todas las cajas se clasifican de una vez contra el ráster de zonas.
+        # Referencia local: set_zones() puede anular self.zone_raster entre medias
+        raster = self._raster(frame.shape)
+        self.last_labels = raster.classify_boxes(rects)
+        return raster.status_for(self.last_labels), rects
@@ -0,0 +1,225 @@
+# =============================================================================
+# AntiÑapas-Pons: Motor multicámara
+# Desc.  : Reparte N cámaras entre varios procesos de trabajo. Cada cámara
+#          tiene su propio MotionPipeline (fondo + zonas) y el proceso
+#          principal solo recibe el estado resumido de cada una. Una cámara
+#          cuyo proceso ha muerto, que deja de informar o que está
+#          desconectada no cuenta como SAFE: pasa a `fail_status` (WARNING).
+# =============================================================================
+
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import cv2
+
+from bg_models import DEFAULT_BACKEND, LearningSchedule
+from frame_grabber import LatestFrameGrabber
+from motion_pipeline import MotionPipeline, worst_status
+
+FRAME_SIZE = (860, 484)
+
+
+def _camera_worker(cameras, control_q, result_q, report_interval=0.5):
+    """Bucle de un proceso de trabajo: lee y procesa sus cámaras asignadas.
+
+    `cameras` es una lista de dicts {id, source, roi, red_zones, amber_zones}
+    (zonas propias de cada cámara: el layout compartido es solo de la principal)
+    y opcionalmente {crop_roi, scale} para el modo recortado/reducido y
+    {backend, backend_params, learning_rates} para el modelo de fondo.
+    """
+    mode = "STOP"
+    slots = {}
+    for cam in cameras:
+        slots[cam["id"]] = {
+            "grabber": LatestFrameGrabber(cam["source"]).start(),
+            "pipeline": MotionPipeline(cam.get("roi"), cam.get("red_zones"), cam.get("amber_zones"),
+                                       crop_to_roi=cam.get("crop_roi", True), scale=cam.get("scale", 1.0),
+                                       backend=cam.get("backend", DEFAULT_BACKEND),
+                                       backend_params=cam.get("backend_params"),
+                                       schedule=LearningSchedule(cam.get("learning_rates"))),
+            "status": "SAFE",
+            "motion": 0,
+            "capture_ts": None,
+            "frames": 0,
+            "latency_ms": 0.0,
+            "t_report": time.monotonic(),
+        }
+
+    running = True
+    while running:
+        # Órdenes del proceso principal (no bloqueante)
+        try:
+            while True:
+                cmd = control_q.get_nowait()
+                if cmd[0] == "stop":
+                    running = False
+                elif cmd[0] == "mode":
+                    mode = cmd[1]
+                    if mode == "CALIBRACION":
+                        for slot in slots.values():
+                            slot["pipeline"].reset_background()
+                elif cmd[0] == "zones" and cmd[1] in slots:
+                    slots[cmd[1]]["pipeline"].set_zones(*cmd[2:])
+        except queue.Empty:
+            pass
+
+        idle = True
+        for cam_id, slot in slots.items():
+            frame, capture_ts, _ = slot["grabber"].read(timeout=0)
+            changed, danger_frame = False, None
+            if frame is not None:
+                idle = False
+                frame = cv2.resize(frame, FRAME_SIZE)
+                status, rects = slot["pipeline"].step(frame, mode)
+                slot["latency_ms"] = (time.monotonic() - capture_ts) * 1000
+                slot["capture_ts"] = capture_ts
+                slot["frames"] += 1
+                slot["motion"] = len(rects)
+
+                # Solo se envía el frame cuando la cámara entra en DANGER (para la foto)
+                if status == "DANGER" and slot["status"] != "DANGER":
+                    danger_frame = frame
+                changed = status != slot["status"]
+                slot["status"] = status
+
+            # También sin frames: el latido dice al principal que el proceso vive
+            # y si la cámara está conectada
+            now = time.monotonic()
+            elapsed = now - slot["t_report"]
+            if changed or elapsed >= report_interval:
+                result_q.put({
+                    "id": cam_id,
+                    "status": slot["status"],
+                    "motion": slot["motion"],
+                    "fps": slot["frames"] / elapsed if elapsed > 0 else 0.0,
+                    "latency_ms": slot["latency_ms"],
+                    "capture_ts": slot["capture_ts"],
+                    "dropped": slot["grabber"].frames_dropped,
+                    "connected": slot["grabber"].connected,
+                    "frame": danger_frame,
+                })
+                if elapsed >= report_interval:
+                    slot["frames"] = 0
+                    slot["t_report"] = now
+        if idle:
+            time.sleep(0.005)
+
+    for slot in slots.values():
+        slot["grabber"].stop()
+
+
+class MultiCameraEngine:
+    """Gestiona los procesos de trabajo y agrega el estado de todas las cámaras."""
+
+    def __init__(self, cameras, workers=None, stale_s=2.0, fail_status="WARNING", on_event=None):
+        # cameras: lista de dicts {source, roi, red_zones, amber_zones}
+        self.cameras = [dict(cam, id=cam.get("id", f"CAM{i}")) for i, cam in enumerate(cameras)]
+        self.workers = workers or max(1, min(len(self.cameras), (os.cpu_count() or 2) - 1))
+        self.stale_s = stale_s              # sin noticias de una cámara durante más → perdida
+        self.fail_status = fail_status      # estado con el que cuenta una cámara perdida
+        self.on_event = on_event
+        self.ctx = mp.get_context("spawn")
+        self.result_q = self.ctx.Queue()
+        self.procs = []
+        self.control_qs = []
+        self.owner = {}  # cam_id -> índice de proceso
+        now = time.monotonic()
+        self.state = {cam["id"]: {"status": "SAFE", "fps": 0.0, "latency_ms": 0.0, "connected": None,
+                                  "received": now, "lost": None}
+                      for cam in self.cameras}
+        self.danger_frame = None
+        self.danger_cam = None
+
+    def start(self):
+        groups = [[] for _ in range(self.workers)]
+        for i, cam in enumerate(self.cameras):
+            groups[i % self.workers].append(cam)
+            self.owner[cam["id"]] = i % self.workers
+        for group in groups:
+            control_q = self.ctx.Queue()
+            proc = self.ctx.Process(target=_camera_worker, args=(group, control_q, self.result_q), daemon=True)
+            proc.start()
+            self.procs.append(proc)
+            self.control_qs.append(control_q)
+        return self
+
+    def stop(self, timeout=2.0):
+        for q in self.control_qs:
+            q.put(("stop",))
+        for proc in self.procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self.procs, self.control_qs = [], []
+
+    def set_mode(self, mode):
+        for q in self.control_qs:
+            q.put(("mode", mode))
+
+    def set_zones(self, cam_id, roi, red_zones, amber_zones):
+        self.control_qs[self.owner[cam_id]].put(("zones", cam_id, roi, red_zones, amber_zones))
+
+    def poll(self):
+        """Vacía la cola de resultados y actualiza el estado por cámara."""
+        while True:
+            try:
+                res = self.result_q.get_nowait()
+            except queue.Empty:
+                break
+            frame = res.pop("frame")
+            if frame is not None:
+                self.danger_frame, self.danger_cam = frame, res["id"]
+            res["received"] = time.monotonic()
+            res["lost"] = self.state[res["id"]]["lost"]
+            self.state[res["id"]] = res
+        self._check_liveness()
+        return self.state
+
+    def _check_liveness(self):
+        """Marca como perdidas las cámaras sin proceso vivo, sin informes recientes o desconectadas."""
+        now = time.monotonic()
+        for cam_id, s in self.state.items():
+            proc = self.procs[self.owner[cam_id]] if self.procs else None
+            if proc is None or not proc.is_alive():
+                lost = "proceso caído"
+            elif now - s["received"] > self.stale_s:
+                lost = f"sin informes en {self.stale_s:.0f}s"
+            elif s["connected"] is False:  # None: aún sin primer informe
+                lost = "desconectada"
+            else:
+                lost = None
+            if lost != s["lost"] and self.on_event:
+                self.on_event(f"📹 {cam_id}: {lost} → cuenta como {self.fail_status}" if lost
+                              else f"📹 {cam_id}: recuperada")
+            s["lost"] = lost
+
+    def combined_status(self):
+        """Peor estado de todas las cámaras; una cámara perdida cuenta como `fail_status`."""
+        return worst_status(worst_status([s["status"], self.fail_status]) if s["lost"] else s["status"]
+                            for s in self.state.values())
+
+    def capture_ts(self, status):
+        """Captura (time.monotonic()) del frame más antiguo que tiene a una cámara en
+        `status`; None si ninguna. El reloj monotónico es del sistema, así que vale
+        para medir plazos en el proceso principal."""
+        stamps = [s["capture_ts"] for s in self.state.values()
+                  if not s["lost"] and s["status"] == status and s.get("capture_ts")]
+        return min(stamps, default=None)
+
+    def take_danger_frame(self):
+        """Frame de la última cámara que entró en DANGER (se consume una vez)."""
+        frame, cam = self.danger_frame, self.danger_cam
+        self.danger_frame = self.danger_cam = None
+        return frame, cam
+
+    def summary_lines(self):
+        lines = []
+        for cam_id, s in self.state.items():
+            if s["lost"]:
+                lines.append(f"❌ {cam_id}: {s['lost']}")
+                continue
+            icon = {"DANGER": "🔴", "WARNING": "🟡"}.get(s["status"], "🟢" if s.get("connected") else "⚪")
+            lines.append(f"{icon} {cam_id}: {s['fps']:.0f} fps · {s['latency_ms']:.0f} ms")
+        return "\n".join(lines)
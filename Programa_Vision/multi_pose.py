@@ -0,0 +1,141 @@
+# =============================================================================
+# AntiÑapas-Pons: Pose multipersona sobre recortes
+# Desc.  : MediaPipe Pose solo ve UNA persona por imagen. Aquí cada persona
+#          candidata (regiones de movimiento de MotionGate + cajas predichas
+#          de las personas ya seguidas) se recorta y se envía a un pool de
+#          hilos, cada uno con su propia instancia de Pose (thread-local).
+#          La pose completa se infiere cada `pose_every` frames; entre medias
+#          los puntos clave se extrapolan con la velocidad medida entre las
+#          dos últimas inferencias, así que TODAS las personas seguidas tienen
+#          posición (y comprobación de zonas) en cada frame.
+# =============================================================================
+
+import concurrent.futures
+import threading
+
+import cv2
+import numpy as np
+
+HIP_L, HIP_R = 23, 24
+
+
+def box_iou(a, b):
+    """IoU de dos cajas (x1, y1, x2, y2)."""
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class PersonTrack:
+    """Una persona: puntos clave (33x2, píxeles del frame) y su velocidad por frame."""
+
+    def __init__(self, track_id, keypoints, frame_idx):
+        self.id = track_id
+        self.keypoints = keypoints
+        self.velocity = np.zeros_like(keypoints)
+        self.frame_idx = frame_idx     # frame de la última inferencia real
+        self.missed = 0
+
+    def predict(self, frame_idx):
+        """Puntos extrapolados al frame `frame_idx` (sin inferencia)."""
+        return self.keypoints + self.velocity * (frame_idx - self.frame_idx)
+
+    def correct(self, keypoints, frame_idx):
+        dt = max(1, frame_idx - self.frame_idx)
+        self.velocity = (keypoints - self.keypoints) / dt
+        self.keypoints = keypoints
+        self.frame_idx = frame_idx
+        self.missed = 0
+
+    def box(self, frame_idx):
+        kp = self.predict(frame_idx)
+        return (int(kp[:, 0].min()), int(kp[:, 1].min()), int(kp[:, 0].max()), int(kp[:, 1].max()))
+
+    def hip(self, frame_idx):
+        kp = self.predict(frame_idx)
+        return tuple((kp[HIP_L] + kp[HIP_R]) / 2)
+
+
+class MultiPoseTracker:
+    """Pose de varias personas por recortes, con pool de hilos y extrapolación."""
+
+    def __init__(self, pose_factory, workers=2, pose_every=3, margin=0.25, max_missed=2, match_iou=0.2):
+        self.pose_factory = pose_factory   # callable() -> instancia de mp Pose
+        self.pose_every = pose_every
+        self.margin = margin
+        self.max_missed = max_missed
+        self.match_iou = match_iou
+        self._local = threading.local()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pose")
+        self.tracks = []
+        self.frame_idx = 0
+        self._next_id = 1
+        self.inferences = 0
+
+    def _pose(self):
+        pose = getattr(self._local, "pose", None)
+        if pose is None:
+            pose = self._local.pose = self.pose_factory()
+        return pose
+
+    def _infer(self, rgb, box):
+        """Pose de UN recorte; devuelve los 33 puntos en coordenadas del frame o None."""
+        x1, y1, x2, y2 = box
+        results = self._pose().process(np.ascontiguousarray(rgb[y1:y2, x1:x2]))
+        if not results.pose_landmarks:
+            return None
+        lm = results.pose_landmarks.landmark
+        return np.array([(x1 + p.x * (x2 - x1), y1 + p.y * (y2 - y1)) for p in lm], np.float32)
+
+    def _expand(self, box, w, h):
+        x1, y1, x2, y2 = box
+        mx, my = int((x2 - x1) * self.margin), int((y2 - y1) * self.margin)
+        return max(0, x1 - mx), max(0, y1 - my), min(w, x2 + mx), min(h, y2 + my)
+
+    def update(self, frame, regions):
+        """Avanza un frame. `regions` = recortes con movimiento (x1, y1, x2, y2).
+
+        Devuelve la lista de tracks vivos; sus posiciones valen para este frame.
+        """
+        self.frame_idx += 1
+        h, w = frame.shape[:2]
+        predicted = [self._expand(t.box(self.frame_idx), w, h) for t in self.tracks]
+        # Movimiento que no cubre ninguna persona seguida → candidata nueva (inferencia ya)
+        new = [r for r in regions if all(box_iou(r, p) < self.match_iou for p in predicted)]
+        due = self.frame_idx % self.pose_every == 0
+        if not new and not due:
+            return self.tracks
+
+        crops = [r for r in (predicted if due else []) + new if r[2] - r[0] > 8 and r[3] - r[1] > 8]
+        if not crops:
+            return self.tracks
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        found = [kp for kp in self.pool.map(lambda b: self._infer(rgb, b), crops) if kp is not None]
+        self.inferences += len(crops)
+        self._associate(found, due)
+        return self.tracks
+
+    def _associate(self, found, full_round):
+        unmatched = list(self.tracks)
+        for kp in found:
+            box = (kp[:, 0].min(), kp[:, 1].min(), kp[:, 0].max(), kp[:, 1].max())
+            best, best_iou = None, self.match_iou
+            for t in unmatched:
+                iou = box_iou(box, t.box(self.frame_idx))
+                if iou > best_iou:
+                    best, best_iou = t, iou
+            if best is not None:
+                best.correct(kp, self.frame_idx)
+                unmatched.remove(best)
+            else:
+                self.tracks.append(PersonTrack(self._next_id, kp, self.frame_idx))
+                self._next_id += 1
+        if full_round:
+            for t in unmatched:
+                t.missed += 1
+            self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+    def close(self):
+        self.pool.shutdown(wait=False)
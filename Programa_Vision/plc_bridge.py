@@ -0,0 +1,131 @@
+# =============================================================================
+# AntiÑapas-Pons: Puente visión → paro de emergencia del PLC
+# Desc.  : Un hilo propio con su bucle asyncio es dueño del PLCConnector
+#          (sesión, heartbeat, reconexión). El hilo de detección solo encola
+#          el paro con call_soon_threadsafe, antes de cualquier trabajo de
+#          GUI, grabación o email. La escritura se confirma o se reintenta
+#          hasta el plazo configurado y se mide la latencia real desde la
+#          captura del frame hasta la confirmación (ack) del PLC.
+# =============================================================================
+
+import asyncio
+import threading
+import time
+
+from metrics import registry as metrics
+from plc_comm import PLCConnector, VISION_STATUS
+
+
+class PLCBridge:
+    """Bucle asyncio en segundo plano con ruta prioritaria para el paro."""
+
+    def __init__(self, endpoint, deadline_ms=100, retry_ms=10, on_event=None, on_mode=None):
+        self.deadline_ms = deadline_ms
+        self.retry_ms = retry_ms
+        self.on_event = on_event
+        self.connector = PLCConnector(endpoint, on_event=on_event, on_mode=on_mode)
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+        self._estop_task = None
+        self.last_ack_ms = None
+        self.stops_sent = 0
+        self.deadline_misses = 0
+
+    def _log(self, msg, event_type="INFO"):
+        if self.on_event:
+            self.on_event(msg, event_type, "PLC")
+
+    # ─────────────────────────────── HILO ────────────────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self.connector.run())
+        self.loop.run_forever()
+
+    def stop(self, timeout=2.0):
+        if not self.loop.is_running():
+            return
+        fut = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        try:
+            fut.result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ─────────────────── Cualquier hilo (no bloquea) ─────────────────────────
+
+    def emergency_stop(self, frame_ts):
+        """Encola el paro. `frame_ts` = time.monotonic() de la captura del frame."""
+        self.loop.call_soon_threadsafe(self._start_estop, frame_ts)
+
+    def set_status(self, status):
+        self.loop.call_soon_threadsafe(self.connector.set_vision_status, status)
+
+    def reset_emergency(self):
+        """Rearme: baja el bit de paro (sin plazo; no es la ruta crítica)."""
+        self.loop.call_soon_threadsafe(lambda: self.loop.create_task(self._reset()))
+
+    # ─────────────────────────── Bucle asyncio ───────────────────────────────
+
+    async def _shutdown(self):
+        await self.connector.stop()
+        tasks = [t for t in asyncio.all_tasks(self.loop) if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start_estop(self, frame_ts):
+        # Un paro en curso ya cubre los siguientes frames en DANGER
+        if self._estop_task is None or self._estop_task.done():
+            self._estop_task = self.loop.create_task(self._estop(frame_ts))
+
+    async def _estop(self, frame_ts):
+        conn = self.connector
+        deadline = frame_ts + self.deadline_ms / 1000
+        attempt = 0
+        missed = False
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            try:
+                if not conn.is_connected:
+                    raise ConnectionError("PLC desconectado")
+                # Tras el plazo se sigue reintentando: un paro nunca se abandona
+                await asyncio.wait_for(
+                    conn.write(emergency_stop=True, vision_status=VISION_STATUS["DANGER"]),
+                    timeout=max(remaining, self.retry_ms / 1000)
+                )
+                break
+            except Exception as e:
+                if not missed and time.monotonic() >= deadline:
+                    missed = True
+                    self.deadline_misses += 1
+                    metrics.inc("plc_deadline_misses")
+                    self._log(f"⛔ PLC: paro SIN confirmar en {self.deadline_ms} ms ({e}), reintentando...", "DANGER")
+                await asyncio.sleep(self.retry_ms / 1000)
+        conn.vision_status = "DANGER"
+        self.last_ack_ms = (time.monotonic() - frame_ts) * 1000
+        if not missed and self.last_ack_ms > self.deadline_ms:
+            self.deadline_misses += 1  # confirmado, pero tarde (p. ej. cola de frames)
+            metrics.inc("plc_deadline_misses")
+        self.stops_sent += 1
+        metrics.observe("frame_to_plc_ack", self.last_ack_ms)
+        metrics.inc("plc_stops")
+        self._log(f"⛔ PLC: paro confirmado {self.last_ack_ms:.1f} ms tras la captura "
+                  f"(intento {attempt}, escritura {conn.last_rtt_ms:.1f} ms)", "DANGER")
+
+    async def _reset(self):
+        if self._estop_task and not self._estop_task.done():
+            self._estop_task.cancel()
+        try:
+            await self.connector.write(emergency_stop=False, vision_status=VISION_STATUS["SAFE"])
+            self.connector.vision_status = "SAFE"
+        except Exception as e:
+            self._log(f"PLC: error al rearmar: {e}")
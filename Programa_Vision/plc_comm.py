@@ -1,63 +1,195 @@
+import argparse
 import asyncio
 from asyncua import Client, ua
 import time
 
+from metrics import registry as metrics
+
+# Nodos del PLC (OPC UA). Se resuelven una sola vez por sesión.
+NODE_IDS = {
+    "emergency_stop": "ns=2;i=2",   # Boolean: paro de emergencia
+    "heartbeat": "ns=2;i=3",        # Boolean: alterna cada segundo (watchdog)
+    "machine_mode": "ns=2;i=4",     # Int/String: modo actual de la máquina
+    "vision_status": "ns=2;i=5",    # Int: 0 SAFE, 1 WARNING, 2 DANGER
+}
+
+# Modos numéricos habituales en el PLC → nombres de la aplicación
+MACHINE_MODES = {0: "STOP", 1: "MANUAL", 2: "AUTOMATICO"}
+VISION_STATUS = {"SAFE": 0, "WARNING": 1, "DANGER": 2}
+
+
+class _ModeHandler:
+    """Recibe las notificaciones de la suscripción al modo de máquina."""
+
+    def __init__(self, connector):
+        self.connector = connector
+
+    def datachange_notification(self, node, val, data):
+        self.connector._on_mode(val)
+
+
 class PLCConnector:
-    def __init__(self, endpoint="opc.tcp://localhost:4840"):
+    def __init__(self, endpoint="opc.tcp://localhost:4840", node_ids=None,
+                 backoff_min=0.5, backoff_max=8.0, timeout=2.0, on_event=None, on_mode=None):
         self.endpoint = endpoint
-        self.client = Client(self.endpoint)
+        self.node_ids = dict(NODE_IDS, **(node_ids or {}))
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.on_event = on_event      # callback(msg) para caídas/reconexiones
+        self.on_mode = on_mode        # callback(modo) cuando el PLC cambia de modo
+        self.client = None
         self.is_connected = False
+        self.nodes = {}               # nombre -> Node (caché de handles)
+        self.variant_types = {}       # nombre -> ua.VariantType (para escribir sin leer)
+        self.machine_mode = "UNKNOWN"
+        self.vision_status = "SAFE"
+        self.reconnects = 0
+        self.last_rtt_ms = 0.0
+        self._subscription = None
+        self._running = False
+
+    def _log(self, msg):
+        if self.on_event:
+            self.on_event(msg)
+        else:
+            print(msg)
+
+    # ─────────────────────────────── SESIÓN ──────────────────────────────────
 
     async def connect(self):
         try:
+            self.client = Client(self.endpoint, timeout=self.timeout)
             await self.client.connect()
+            # Handles y tipos resueltos una vez: las escrituras no necesitan lecturas previas
+            self.nodes = {name: self.client.get_node(nid) for name, nid in self.node_ids.items()}
+            for name, node in self.nodes.items():
+                self.variant_types[name] = await node.read_data_type_as_variant_type()
+            # Modo de máquina por suscripción (el PLC avisa), no por sondeo
+            self._subscription = await self.client.create_subscription(100, _ModeHandler(self))
+            await self._subscription.subscribe_data_change(self.nodes["machine_mode"])
             self.is_connected = True
-            print(f"AntiÑapas-Pons: Conectado al PLC en {self.endpoint}")
+            self._log(f"AntiÑapas-Pons: Conectado al PLC en {self.endpoint}")
             return True
         except Exception as e:
-            print(f"Error de conexión PLC: {e}")
+            self._log(f"Error de conexión PLC: {e}")
+            await self._drop()
             return False
 
+    async def _drop(self):
+        """Cierra la sesión actual sin propagar errores (socket ya muerto, etc.)."""
+        self.is_connected = False
+        self._subscription = None
+        if self.client is not None:
+            try:
+                await self.client.disconnect()
+            except Exception:
+                pass
+        self.client = None
+        self.nodes = {}
+
+    def _on_mode(self, val):
+        mode = MACHINE_MODES.get(val, str(val)) if not isinstance(val, str) else val
+        if mode != self.machine_mode:
+            self.machine_mode = mode
+            if self.on_mode:
+                self.on_mode(mode)
+
+    async def run(self):
+        """Supervisor: conecta, mantiene el heartbeat y reconecta con espera exponencial."""
+        self._running = True
+        backoff = self.backoff_min
+        while self._running:
+            if not await self.connect():
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            backoff = self.backoff_min
+            await self.send_heartbeat()
+            if self._running:
+                self.reconnects += 1
+                metrics.inc("plc_reconnects")
+                self._log("⚠ PLC: conexión perdida, reconectando...")
+                await self._drop()
+
+    async def stop(self):
+        self._running = False
+        await self.disconnect()
+
+    # ─────────────────────────────── ESCRITURA ───────────────────────────────
+
+    async def write(self, **values):
+        """Escribe varios nodos en UNA petición Write. Devuelve el tiempo de ida y vuelta en ms."""
+        names = list(values)
+        nodes = [self.nodes[n] for n in names]
+        # Sin SourceTimestamp: muchos PLC rechazan escrituras que lo incluyen
+        dvs = [ua.DataValue(ua.Variant(values[n], self.variant_types.get(n))) for n in names]
+        t0 = time.perf_counter()
+        await self.client.write_values(nodes, dvs)
+        self.last_rtt_ms = (time.perf_counter() - t0) * 1000
+        metrics.observe("plc_write", self.last_rtt_ms)
+        return self.last_rtt_ms
+
     async def send_emergency_stop(self):
-        """Dispara el bit de emergencia en el PLC"""
-        if not self.is_connected: return
+        """Dispara el bit de emergencia en el PLC (junto con el estado de visión)."""
+        if not self.is_connected: return None
         try:
-            # Ejemplo: Escribir en una variable del PLC
-            # node = self.client.get_node("ns=2;i=2") 
-            # await node.write_value(True)
-            print("!!! EMERGENCY STOP SENT TO PLC !!!")
+            self.vision_status = "DANGER"
+            rtt = await self.write(emergency_stop=True, vision_status=VISION_STATUS["DANGER"])
+            self._log(f"!!! EMERGENCY STOP SENT TO PLC !!! ({rtt:.1f} ms)")
+            return rtt
         except Exception as e:
-            print(f"Error enviando emergencia: {e}")
+            self._log(f"Error enviando emergencia: {e}")
+            return None
+
+    def set_vision_status(self, status):
+        """El estado se envía con el siguiente heartbeat (misma petición)."""
+        self.vision_status = status
 
     async def send_heartbeat(self):
         """Envía un bit que alterna cada segundo para el Watchdog del PLC"""
         val = False
-        while self.is_connected:
+        while self.is_connected and self._running:
             try:
-                # node = self.client.get_node("ns=2;i=3")
-                # await node.write_value(val)
+                await self.write(heartbeat=val, vision_status=VISION_STATUS.get(self.vision_status, 0))
                 val = not val
                 await asyncio.sleep(1)
-            except:
+            except Exception:
                 self.is_connected = False
                 break
 
     async def get_machine_mode(self):
-        """Lee el modo actual de la máquina desde el PLC"""
+        """Modo actual de la máquina (último valor recibido por la suscripción)"""
         if not self.is_connected: return "MANUAL"
-        try:
-            # node = self.client.get_node("ns=2;i=4")
-            # val = await node.read_value()
-            # return val (un string o int mapeado)
-            return "AUTOMATICO"
-        except:
-            return "UNKNOWN"
+        return self.machine_mode
 
     async def disconnect(self):
-        await self.client.disconnect()
-        self.is_connected = False
+        await self._drop()
+
+
+async def _bench(endpoint, n):
+    """Latencia de ida y vuelta de escrituras por lotes contra `endpoint`."""
+    conn = PLCConnector(endpoint)
+    if not await conn.connect():
+        return
+    samples = []
+    for i in range(n):
+        samples.append(await conn.write(heartbeat=bool(i % 2), vision_status=0))
+    samples.sort()
+    pct = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    print(f"{n} escrituras: p50={pct(0.5):.2f} ms  p95={pct(0.95):.2f} ms  p99={pct(0.99):.2f} ms  "
+          f"max={samples[-1]:.2f} ms  modo={conn.machine_mode}")
+    await conn.disconnect()
+
 
 if __name__ == "__main__":
-    # Test rápido de conexión
-    conn = PLCConnector()
-    asyncio.run(conn.connect())
+    # Test rápido de conexión (y latencia con --bench N; ver plc_sim.py para un PLC local)
+    parser = argparse.ArgumentParser(description="Prueba de conexión con el PLC")
+    parser.add_argument("--endpoint", default="opc.tcp://localhost:4840")
+    parser.add_argument("--bench", type=int, default=0, help="nº de escrituras para medir latencia")
+    args = parser.parse_args()
+    if args.bench:
+        asyncio.run(_bench(args.endpoint, args.bench))
+    else:
+        conn = PLCConnector(args.endpoint)
+        asyncio.run(conn.connect())
@@ -0,0 +1,70 @@
+# =============================================================================
+# AntiÑapas-Pons: PLC simulado (servidor OPC UA local)
+# Desc.  : Sustituto del PLC real para pruebas: expone los mismos nodos que
+#          usa PLCConnector (paro de emergencia, heartbeat, modo de máquina y
+#          estado de visión), registra las escrituras que recibe y puede
+#          cambiar el modo de máquina periódicamente para probar la
+#          suscripción. Ejemplo:
+#              python plc_sim.py --mode-cycle 5
+#              python plc_comm.py --bench 500
+# =============================================================================
+
+import argparse
+import asyncio
+import time
+
+from asyncua import Server, ua
+
+from plc_comm import MACHINE_MODES, NODE_IDS
+
+NODE_TYPES = {
+    "emergency_stop": (False, ua.VariantType.Boolean),
+    "heartbeat": (False, ua.VariantType.Boolean),
+    "machine_mode": (2, ua.VariantType.Int16),
+    "vision_status": (0, ua.VariantType.Int16),
+}
+
+
+async def build_server(endpoint="opc.tcp://0.0.0.0:4840/"):
+    server = Server()
+    await server.init()
+    server.set_endpoint(endpoint)
+    server.set_server_name("AntiÑapas-Pons PLC simulado")
+    idx = await server.register_namespace("urn:antinapas:plc-sim")
+    plc = await server.nodes.objects.add_object(idx, "PLC")
+    nodes = {}
+    for name, nid in NODE_IDS.items():
+        value, vtype = NODE_TYPES.get(name, (0, ua.VariantType.Int16))
+        node = await plc.add_variable(ua.NodeId.from_string(nid), name, ua.Variant(value, vtype))
+        await node.set_writable()
+        nodes[name] = node
+    return server, nodes
+
+
+async def main(endpoint, mode_cycle):
+    server, nodes = await build_server(endpoint)
+    async with server:
+        print(f"PLC simulado en {endpoint} (Ctrl+C para salir)")
+        last = {name: await node.read_value() for name, node in nodes.items()}
+        next_mode = time.monotonic() + mode_cycle if mode_cycle else None
+        modes = sorted(MACHINE_MODES)
+        while True:
+            await asyncio.sleep(0.05)
+            if next_mode and time.monotonic() >= next_mode:
+                mode = modes[(modes.index(last["machine_mode"]) + 1) % len(modes)]
+                await nodes["machine_mode"].write_value(ua.Variant(mode, ua.VariantType.Int16))
+                next_mode += mode_cycle
+            for name, node in nodes.items():
+                value = await node.read_value()
+                if value != last[name]:
+                    if name != "heartbeat":
+                        print(f"[{time.strftime('%H:%M:%S')}] {name} = {value}")
+                    last[name] = value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor OPC UA que simula el PLC de la línea")
+    parser.add_argument("--endpoint", default="opc.tcp://0.0.0.0:4840/")
+    parser.add_argument("--mode-cycle", type=float, default=0, help="cambiar el modo de máquina cada N s")
+    args = parser.parse_args()
+    asyncio.run(main(args.endpoint, args.mode_cycle))
@@ -0,0 +1,95 @@
+# =============================================================================
+# AntiÑapas-Pons: Vista previa Tk a cadencia fija
+# Desc.  : El hilo de detección solo deja su último frame en un buffer de una
+#          posición. El hilo de Tk lo recoge a los FPS de vista previa
+#          configurados, reutiliza un único PhotoImage (paste) y descarta los
+#          frames que no llegó a mostrar. Así la detección puede ir más rápida
+#          que la pantalla sin inundar la cola de eventos de Tk.
+# =============================================================================
+
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+from metrics import registry as metrics
+
+
+class PreviewDisplay:
+    """Muestra en un canvas Tk el frame más reciente a `fps` fijos."""
+
+    def __init__(self, canvas, image_item, fps=15, danger_check=None):
+        self.canvas = canvas
+        self.image_item = image_item
+        self.interval_ms = max(1, int(1000 / fps))
+        self.danger_check = danger_check  # callable() -> bool: mostrar velo rojo
+        self._lock = threading.Lock()
+        self._frame = None
+        self._fresh = False
+        self.photo = None
+        self.frames_shown = 0
+        self.frames_skipped = 0
+        self._danger_item = None
+        self._danger_visible = False
+        self._running = False
+
+    # ───────────────────── Hilo de detección ─────────────────────────────────
+
+    def submit(self, frame_bgr):
+        """Deja el frame para la próxima actualización (no bloquea, no copia)."""
+        with self._lock:
+            if self._fresh:
+                self.frames_skipped += 1
+            self._frame = frame_bgr
+            self._fresh = True
+
+    # ───────────────────────── Hilo de Tk ────────────────────────────────────
+
+    def start(self):
+        self._running = True
+        self.canvas.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def _tick(self):
+        if not self._running:
+            return
+        t0 = time.perf_counter()
+        try:
+            with self._lock:
+                frame, fresh = self._frame, self._fresh
+                self._fresh = False
+            if fresh and frame is not None:
+                self.paint(frame)
+                metrics.lap("display", t0)
+                metrics.set("preview_skipped", self.frames_skipped)
+        except Exception as e:
+            # Un frame que no se puede pintar no debe parar la vista previa
+            print(f"Error en la vista previa: {e}")
+            metrics.inc("preview_errors")
+        finally:
+            self.canvas.after(self.interval_ms, self._tick)
+
+    def paint(self, frame):
+        """Pinta `frame` (BGR) en el canvas. Solo desde el hilo de Tk."""
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if self.photo is None or (self.photo.width(), self.photo.height()) != img.size:
+            self.photo = ImageTk.PhotoImage(image=img)
+            self.canvas.itemconfig(self.image_item, image=self.photo)
+            self.canvas.tag_lower(self.image_item)
+        else:
+            self.photo.paste(img)  # mismo buffer: sin crear imágenes nuevas
+        self.frames_shown += 1
+        self._update_danger(img.size)
+
+    def _update_danger(self, size):
+        show = bool(self.danger_check and self.danger_check())
+        if self._danger_item is None:
+            self._danger_item = self.canvas.create_rectangle(
+                0, 0, size[0], size[1], fill="red", stipple="gray25", state="hidden", tags="danger_overlay"
+            )
+        if show != self._danger_visible:
+            self.canvas.itemconfig(self._danger_item, state="normal" if show else "hidden")
+            self._danger_visible = show
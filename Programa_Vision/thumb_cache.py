@@ -0,0 +1,45 @@
+# =============================================================================
+# AntiÑapas-Pons: Caché de miniaturas de capturas
+# Desc.  : Cada foto de emergencia tiene su miniatura en `.thumbs/` junto a
+#          ella. CaptureWriter la genera al escribir la foto (el frame ya
+#          está en memoria) y el visor solo lee esos JPEG pequeños. Para
+#          capturas antiguas sin miniatura se genera una vez, decodificando la
+#          imagen original a 1/4 de resolución (IMREAD_REDUCED_COLOR_4).
+# =============================================================================
+
+import os
+
+import cv2
+from PIL import Image
+
+THUMB_DIR = ".thumbs"
+THUMB_SIZE = (170, 96)
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def thumb_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, THUMB_DIR, os.path.splitext(name)[0] + ".jpg")
+
+
+def write_thumb(path, frame_bgr, size=THUMB_SIZE):
+    """Guarda la miniatura de `path` a partir del frame BGR ya en memoria."""
+    tp = thumb_path(path)
+    os.makedirs(os.path.dirname(tp), exist_ok=True)
+    thumb = cv2.resize(frame_bgr, size, interpolation=cv2.INTER_AREA)
+    cv2.imwrite(tp, thumb, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+    return tp
+
+
+def load_thumb(path, size=THUMB_SIZE):
+    """Miniatura RGB (PIL) de `path`; la crea si aún no existe. None si no se puede leer."""
+    tp = thumb_path(path)
+    if not os.path.exists(tp):
+        frame = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_4)
+        if frame is None:
+            return None
+        write_thumb(path, frame, size)
+    img = Image.open(tp)
+    img.load()
+    return img.convert("RGB")
+
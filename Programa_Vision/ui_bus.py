@@ -0,0 +1,99 @@
+# =============================================================================
+# AntiÑapas-Pons: Bus de actualizaciones de la interfaz
+# Desc.  : Los hilos de vídeo y de trabajo nunca tocan widgets de Tk: publican
+#          en este bus. El hilo de Tk lo vacía a un ritmo fijo y agrupa lo
+#          repetido: de cada clave (p. ej. el indicador de estado) solo se
+#          aplica la última actualización, y todas las líneas de consola
+#          pendientes entran con un único insert. La consola es un anillo
+#          acotado para que no crezca en turnos de varios días.
+# =============================================================================
+
+import collections
+import threading
+
+from metrics import registry as metrics
+
+
+class UiBus:
+    """Cola de actualizaciones de Tk segura entre hilos, con coalescencia por clave."""
+
+    def __init__(self, root, interval_ms=50, console_lines=2000):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.console_lines = console_lines
+        self.console = None
+        self._lock = threading.Lock()
+        self._latest = {}   # clave -> (fn, args, kwargs): solo cuenta la última
+        self._calls = []    # llamadas únicas, en orden (diálogos, cambios de modo...)
+        self._lines = collections.deque(maxlen=console_lines)
+        self._console_count = 0
+        self.coalesced = 0
+        self._running = False
+
+    # ───────────────────────── Cualquier hilo ────────────────────────────────
+
+    def post(self, key, fn, *args, **kwargs):
+        """Actualización con clave: si ya había una pendiente, se sustituye."""
+        with self._lock:
+            if key in self._latest:
+                self.coalesced += 1
+            self._latest[key] = (fn, args, kwargs)
+
+    def call(self, fn, *args, **kwargs):
+        """Llamada que debe ejecutarse siempre (no se agrupa)."""
+        with self._lock:
+            self._calls.append((fn, args, kwargs))
+
+    def log(self, line):
+        with self._lock:
+            self._lines.append(line)
+
+    # ───────────────────────── Hilo de Tk ────────────────────────────────────
+
+    def start(self, console=None):
+        self.console = console
+        self._running = True
+        self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def _tick(self):
+        if not self._running:
+            return
+        try:
+            with self._lock:
+                calls, self._calls = self._calls, []
+                latest, self._latest = self._latest, {}
+                lines = list(self._lines)
+                self._lines.clear()
+            # Un callback que falla no se lleva por delante al resto ni al bus
+            for fn, args, kwargs in calls:
+                self._run(fn, args, kwargs)
+            for fn, args, kwargs in latest.values():
+                self._run(fn, args, kwargs)
+            if lines and self.console is not None:
+                self._append_console(lines)
+            metrics.set("ui_coalesced", self.coalesced)
+        except Exception as e:
+            print(f"Error en el bus de interfaz: {e}")
+        finally:
+            self.root.after(self.interval_ms, self._tick)
+
+    def _run(self, fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            name = getattr(fn, "__qualname__", repr(fn))
+            print(f"Error en actualización de interfaz ({name}): {e}")
+            metrics.inc("ui_errors")
+            self.log(f"❌ Interfaz: {name}: {e}")
+
+    def _append_console(self, lines):
+        self.console.insert("end", "\n".join(lines) + "\n")
+        self._console_count += len(lines)
+        excess = self._console_count - self.console_lines
+        if excess > 0:
+            self.console.delete("1.0", f"{excess + 1}.0")
+            self._console_count -= excess
+        self.console.see("end")
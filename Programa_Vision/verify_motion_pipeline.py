@@ -0,0 +1,120 @@
+# =============================================================================
+# AntiÑapas-Pons: Verificación del pipeline recortado/reducido
+# Desc.  : Reproduce grabaciones con el pipeline de referencia (frame completo)
+#          y con el modo ROI/escala, y compara estado por frame, cajas de
+#          movimiento y coste. Sale con código 1 si la concordancia no llega
+#          al mínimo exigido. El modo reducido (--scale < 1) es experimental:
+#          diverge sobre todo si algo se mueve durante la calibración, y la
+#          herramienta avisa cuando el tramo de calibración no está quieto.
+#
+# Uso    : python verify_motion_pipeline.py captures/GRABACION_*.avi --scale 0.5
+# =============================================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from layout_store import LAYOUT_FILE, read_layout, rects_from_layout
+from motion_pipeline import MotionPipeline
+
+FRAME_SIZE = (860, 484)
+
+
+def load_zones(settings_path, layout_path=LAYOUT_FILE):
+    """ROI y zonas del layout compartido; si no hay, de una configuración antigua."""
+    roi, red, amber = rects_from_layout(read_layout(layout_path), FRAME_SIZE)
+    if roi or not os.path.exists(settings_path):
+        return roi, red, amber
+    with open(settings_path, "r") as f:
+        d = json.load(f)
+    return d.get("roi"), d.get("red_zones", []), d.get("amber_zones", [])
+
+
+def compare_clip(path, roi, red, amber, scale, crop=True, warmup=30):
+    ref = MotionPipeline(roi, red, amber, crop_to_roi=False, scale=1.0)
+    cand = MotionPipeline(roi, red, amber, crop_to_roi=crop, scale=scale)
+    cap = cv2.VideoCapture(path)
+    frames = agree = danger_ref = danger_both = 0
+    t_ref = t_cand = 0.0
+    boxes_ref = boxes_cand = 0
+    idx = calib_motion = 0
+    prev_gray = None
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(frame, FRAME_SIZE)
+        idx += 1
+        if idx <= warmup:
+            # Misma calibración inicial para ambos modelos
+            ref.learn(frame)
+            cand.learn(frame)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if prev_gray is not None:
+                _, moved = cv2.threshold(cv2.absdiff(gray, prev_gray), 25, 255, cv2.THRESH_BINARY)
+                calib_motion += cv2.countNonZero(moved) > ref.min_area
+            prev_gray = gray
+            continue
+        t0 = time.perf_counter()
+        s_ref, r_ref = ref.process(frame)
+        t1 = time.perf_counter()
+        s_cand, r_cand = cand.process(frame)
+        t2 = time.perf_counter()
+        t_ref += t1 - t0
+        t_cand += t2 - t1
+        frames += 1
+        agree += s_ref == s_cand
+        danger_ref += s_ref == "DANGER"
+        danger_both += s_ref == "DANGER" and s_cand == "DANGER"
+        boxes_ref += len(r_ref)
+        boxes_cand += len(r_cand)
+    cap.release()
+    return {
+        "clip": os.path.basename(path),
+        "frames": frames,
+        "calib_motion": calib_motion,
+        "status_agreement": agree / frames if frames else 1.0,
+        "danger_recall": danger_both / danger_ref if danger_ref else 1.0,
+        "boxes_ref": boxes_ref,
+        "boxes_cand": boxes_cand,
+        "ms_ref": t_ref / frames * 1000 if frames else 0.0,
+        "ms_cand": t_cand / frames * 1000 if frames else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el pipeline de movimiento completo con el modo ROI/escala.")
+    parser.add_argument("clips", nargs="+", help="Vídeos grabados (AVI/MP4)")
+    parser.add_argument("--layout", default=LAYOUT_FILE, help="Layout compartido con el ROI y las zonas")
+    parser.add_argument("--settings", default="logs/factory_settings.json", help="Configuración antigua con roi/red_zones/amber_zones")
+    parser.add_argument("--scale", type=float, default=1.0, help="Escala del modelo de fondo (1, 0.5, 0.25...)")
+    parser.add_argument("--no-crop", action="store_true", help="No recortar al ROI (solo escalar)")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Concordancia mínima de estado exigida")
+    args = parser.parse_args()
+
+    roi, red, amber = load_zones(args.settings, args.layout)
+    if not roi:
+        print("La configuración no tiene ROI: no hay nada que comparar.")
+        return 1
+
+    ok = True
+    for clip in args.clips:
+        r = compare_clip(clip, roi, red, amber, args.scale, crop=not args.no_crop)
+        speedup = r["ms_ref"] / r["ms_cand"] if r["ms_cand"] else 0.0
+        print(f"{r['clip']}: {r['frames']} frames | estado {r['status_agreement']:.2%} | "
+              f"DANGER {r['danger_recall']:.2%} | cajas {r['boxes_ref']}/{r['boxes_cand']} | "
+              f"{r['ms_ref']:.2f} → {r['ms_cand']:.2f} ms/frame (x{speedup:.1f})")
+        if r["calib_motion"]:
+            print(f"  ⚠ Movimiento en {r['calib_motion']} frames de calibración: los modelos reducidos "
+                  f"aprenden otro fondo y la comparación no es representativa")
+        ok &= r["status_agreement"] >= args.min_agreement and r["danger_recall"] >= args.min_agreement
+    print("✅ Equivalente" if ok else "❌ Diferencias por encima del umbral")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
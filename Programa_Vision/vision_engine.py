@@ -5,6 +5,11 @@ from mediapipe.tasks.python import vision
 import numpy as np
 import os
 
+from face_tracker import FaceAnonymizer
+from motion_gate import MotionGate
+from multi_pose import MultiPoseTracker
+from zone_raster import ZoneRaster, _poly
+
 class AntiNapasVision:
     def __init__(self):
         # Intentar usar la nueva API de Tasks (más compatible con 3.14/lite)
@@ -13,7 +18,11 @@ class AntiNapasVision:
             self.use_tasks = False
             if hasattr(mp, 'solutions'):
                 self.mp_pose = mp.solutions.pose
-                self.pose = self.mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+                # Una instancia de Pose por hilo del pool; cada recorte es una persona
+                self.people = MultiPoseTracker(
+                    lambda: self.mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5),
+                    workers=2, pose_every=3
+                )
                 self.mp_draw = mp.solutions.drawing_utils
                 self.use_tasks = False
             else:
@@ -30,54 +39,95 @@ class AntiNapasVision:
             self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
 
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.anonymizer = FaceAnonymizer(self.face_cascade, 1.1, 4)
+
+        # Compuerta de movimiento: el detector de personas solo corre donde hay algo
+        self.gate = MotionGate()
+
+        # Ráster de zonas: se recompila solo cuando cambian las zonas o el tamaño
+        self._zones_src = None
+        self._zone_raster = None
+
+    def _compiled_zones(self, zones, shape):
+        raster = self._zone_raster
+        if raster is None or raster.shape != shape[:2] or \
+                (zones is not self._zones_src and zones != self._zones_src):
+            self._zones_src = zones
+            self._zone_raster = ZoneRaster.from_polygons(shape, zones)
+        return self._zone_raster
 
     def process_frame(self, frame, zones=[]):
         h, w, _ = frame.shape
         status = "SAFE"
         detected_points = []
 
-        # 1. Detección de personas
+        # 1. Detección de personas, solo en los recortes con movimiento
+        #    (escena quieta → sin regiones → el detector no se ejecuta)
+        regions = self.gate.regions(frame)
+        person_boxes = []
         if not hasattr(self, 'use_fallback') or not self.use_fallback:
-            # Usar Mediapipe Solutions (si está disponible)
-            results = self.pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            if results.pose_landmarks:
-                mid_hip_x = (results.pose_landmarks.landmark[23].x + results.pose_landmarks.landmark[24].x) / 2 * w
-                mid_hip_y = (results.pose_landmarks.landmark[23].y + results.pose_landmarks.landmark[24].y) / 2 * h
-                detected_points.append((mid_hip_x, mid_hip_y))
-        else:
+            # Usar Mediapipe Solutions (si está disponible): una pose por persona.
+            # Se llama en todos los frames: entre inferencias los puntos se extrapolan
+            n = self.people.frame_idx + 1
+            for person in self.people.update(frame, regions):
+                detected_points.append(person.hip(n))
+                x1, y1, x2, y2 = person.box(n)
+                person_boxes.append((x1, y1, x2 - x1, y2 - y1))
+        elif regions:
             # Fallback a OpenCV HOG (Detector de personas estándar)
             # Esto asegura que el código ARRANQUE aunque mediapipe esté capado
-            rects, weights = self.hog.detectMultiScale(frame, winStride=(8, 8), padding=(32, 32), scale=1.05)
-            for (x, y, w_p, h_p) in rects:
-                detected_points.append((x + w_p/2, y + h_p/2))
-
-        # 2. Verificación de Zonas
-        for px, py in detected_points:
-            for zone in zones:
-                poly = np.array(zone['points'], np.int32)
-                is_inside = cv2.pointPolygonTest(poly, (px, py), False) >= 0
-                
-                if is_inside:
-                    if zone['type'] == 'RED': status = "DANGER"
-                    elif zone['type'] == 'AMBER' and status != "DANGER": status = "WARNING"
+            for (x1, y1, x2, y2) in regions:
+                rects, weights = self.hog.detectMultiScale(frame[y1:y2, x1:x2], winStride=(8, 8),
+                                                           padding=(32, 32), scale=1.05)
+                for (x, y, w_p, h_p) in rects:
+                    detected_points.append((x1 + x + w_p/2, y1 + y + h_p/2))
+                    person_boxes.append((x1 + x, y1 + y, w_p, h_p))
+        self.gate.hold(person_boxes)
+
+        # 2. Verificación de Zonas (una sola consulta al ráster compilado)
+        if detected_points and zones:
+            raster = self._compiled_zones(zones, frame.shape)
+            status = raster.status_for(raster.classify_points(detected_points))
 
         # 3. Anonimización
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+        faces = self.anonymizer.update(frame, fg_mask=self.gate.fg_mask if regions else None)
         for (x, y, w_f, h_f) in faces:
             face_zone = frame[y:y+h_f, x:x+w_f]
             face_zone = cv2.GaussianBlur(face_zone, (49, 49), 30)
             frame[y:y+h_f, x:x+w_f] = face_zone
 
+        # Punto de referencia de cada persona (el que se comprueba contra las zonas)
+        for (px, py) in detected_points:
+            cv2.circle(frame, (int(px), int(py)), 5, (255, 255, 0), -1)
+
         # 4. Dibujar Zonas
         for zone in zones:
             color = (0, 0, 255) if zone['type'] == 'RED' else (0, 255, 255)
-            poly = np.array(zone['points'], np.int32)
-            cv2.polylines(frame, [poly], True, color, 2)
+            # Puntos como tuplas o como dicts {'x','y'} (layout_store.zones_to_pixels)
+            cv2.polylines(frame, [_poly(zone['points'])], True, color, 2)
             
         return frame, status
 
+def self_check():
+    """Un frame sintético con una zona sacada del layout compartido (puntos como dicts)."""
+    from layout_store import layout_from_rects, zones_to_pixels
+    size = (860, 484)
+    layout = layout_from_rects(None, [(100, 100, 400, 400)], [(450, 100, 700, 300)], size)
+    zones = zones_to_pixels(layout, size)
+    frame = np.zeros((size[1], size[0], 3), np.uint8)
+    vision = AntiNapasVision()
+    for _ in range(3):
+        out, status = vision.process_frame(frame.copy(), zones)
+    drawn = bool(out[100:401, 100:401].any())
+    print(f"{'✅' if drawn else '❌'} process_frame con zonas del layout: {status}, zonas dibujadas={drawn}")
+    return 0 if drawn else 1
+
+
 if __name__ == "__main__":
+    import sys
+    if "--check" in sys.argv:
+        sys.exit(self_check())
+
     # Test simple con webcam
     cap = cv2.VideoCapture(0)
     vision = AntiNapasVision()
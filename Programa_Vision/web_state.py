@@ -0,0 +1,115 @@
+# =============================================================================
+# AntiÑapas-Pons: Estado del portal web en memoria
+# Desc.  : CachedJsonFile guarda un JSON en memoria y solo lo vuelve a leer
+#          cuando cambia su mtime/tamaño. ChangeHub reparte cambios de estado
+#          a los clientes Server-Sent Events: cada cliente espera a que la
+#          versión avance y recibe solo lo que ha cambiado. Los id de evento
+#          llevan un identificador de arranque: un navegador que reconecta
+#          tras reiniciar el servidor recibe el estado completo otra vez.
+# =============================================================================
+
+import json
+import os
+import threading
+
+
+class CachedJsonFile:
+    """JSON en memoria recargado solo cuando el fichero cambia en disco."""
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = default
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = default
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def get(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return self._data
+        with self._lock:
+            if stamp != self._stamp:
+                if stamp is None:
+                    self._data = self.default
+                else:
+                    try:
+                        with open(self.path, "r") as f:
+                            self._data = json.load(f)
+                    except (OSError, ValueError):
+                        return self._data  # escritura a medias: se reintenta en la próxima
+                    self.reloads += 1
+                self._stamp = stamp
+        return self._data
+
+    def changed(self):
+        """True si el fichero ha cambiado desde la última lectura."""
+        return self._file_stamp() != self._stamp
+
+    def set(self, data):
+        """Escribe el JSON de forma atómica y actualiza la caché."""
+        tmp = f"{self.path}.{os.getpid()}.tmp"  # un tmp por proceso: dos escritores no se pisan
+        with self._lock:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            self._data = data
+            self._stamp = self._file_stamp()
+
+
+class ChangeHub:
+    """Canal de cambios con versión para clientes SSE."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.boot = os.urandom(4).hex()  # distingue los id de este arranque de los anteriores
+        self.version = 0
+        self.latest = {}  # tipo -> (versión, datos)
+
+    def publish(self, kind, data):
+        """Publica `data` bajo `kind` solo si es distinto de lo último publicado."""
+        with self._cond:
+            prev = self.latest.get(kind)
+            if prev is not None and prev[1] == data:
+                return False
+            self.version += 1
+            self.latest[kind] = (self.version, data)
+            self._cond.notify_all()
+            return True
+
+    def wait(self, since, timeout=15.0):
+        """Espera cambios posteriores a `since`. Devuelve (versión, {tipo: datos})."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since, timeout=timeout)
+            changes = {k: d for k, (v, d) in self.latest.items() if v > since}
+            return self.version, changes
+
+    def parse_event_id(self, last_event_id):
+        """Last-Event-ID del cliente → versión desde la que enviar (0 = todo).
+
+        Un id de otro arranque, mal formado o por delante de la versión
+        actual se trata como 0.
+        """
+        boot, _, version = (last_event_id or "").partition(".")
+        if boot != self.boot or not version.isdigit():
+            return 0
+        version = int(version)
+        return version if version <= self.version else 0
+
+    def sse_stream(self, since=0):
+        """Generador text/event-stream; envía un comentario de keep-alive si no hay cambios."""
+        version = since if since <= self.version else 0
+        while True:
+            version, changes = self.wait(version)
+            if not changes:
+                yield ": keep-alive\n\n"
+                continue
+            for kind, data in changes.items():
+                yield f"id: {self.boot}.{version}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
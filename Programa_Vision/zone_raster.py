@@ -0,0 +1,104 @@
+# =============================================================================
+# AntiÑapas-Pons: Ráster de zonas compilado
+# Desc.  : Las zonas (rectángulos del escritorio o polígonos del editor web)
+#          se pintan UNA vez, cuando cambian, en una máscara de etiquetas
+#          (0 = libre, 1 = ÁMBAR, 2 = ROJA). Con imágenes integrales por
+#          etiqueta, clasificar una caja cuesta 4 lecturas sin importar cuántas
+#          zonas haya; los puntos se clasifican con un único indexado NumPy.
+# =============================================================================
+
+import cv2
+import numpy as np
+
+LABEL_NONE, LABEL_AMBER, LABEL_RED = 0, 1, 2
+LABEL_STATUS = {LABEL_NONE: "SAFE", LABEL_AMBER: "WARNING", LABEL_RED: "DANGER"}
+TYPE_LABEL = {"AMBER": LABEL_AMBER, "RED": LABEL_RED}
+
+
+def _poly(points):
+    """Acepta [(x, y), ...] o [{'x':, 'y':}, ...] (formato del editor web)."""
+    pts = [(p["x"], p["y"]) if isinstance(p, dict) else p for p in points]
+    return np.round(np.array(pts, np.float64)).astype(np.int32)
+
+
+class ZoneRaster:
+    """Máscara de etiquetas de zona para un tamaño de frame concreto."""
+
+    def __init__(self, shape):
+        h, w = shape[:2]
+        self.shape = (h, w)
+        self.labels = np.zeros((h, w), np.uint8)
+        self.zone_count = 0
+        self._integrals = None
+
+    # ─────────────────────────────── COMPILAR ────────────────────────────────
+
+    @classmethod
+    def from_rects(cls, shape, red_zones, amber_zones):
+        """Zonas del escritorio: listas de (x1, y1, x2, y2) inclusivos."""
+        raster = cls(shape)
+        # ÁMBAR primero: donde se solapan, ROJA sobrescribe (ROJA > ÁMBAR)
+        for label, zones in ((LABEL_AMBER, amber_zones), (LABEL_RED, red_zones)):
+            for x1, y1, x2, y2 in zones or []:
+                cv2.rectangle(raster.labels, (int(x1), int(y1)), (int(x2), int(y2)), label, -1)
+                raster.zone_count += 1
+        raster._build()
+        return raster
+
+    @classmethod
+    def from_polygons(cls, shape, zones):
+        """Zonas del editor web: [{'type': 'RED'|'AMBER', 'points': [...]}, ...]."""
+        raster = cls(shape)
+        ordered = sorted(zones or [], key=lambda z: TYPE_LABEL.get(z.get("type"), 0))
+        for zone in ordered:
+            label = TYPE_LABEL.get(zone.get("type"))
+            if label is None or len(zone.get("points", [])) < 3:
+                continue
+            cv2.fillPoly(raster.labels, [_poly(zone["points"])], label)
+            raster.zone_count += 1
+        raster._build()
+        return raster
+
+    def _build(self):
+        # Integral de "cualquier zona" y de "zona roja" → consultas de caja O(1)
+        any_zone = (self.labels > 0).astype(np.uint8)
+        red = (self.labels == LABEL_RED).astype(np.uint8)
+        self._integrals = (cv2.integral(any_zone), cv2.integral(red))
+
+    # ─────────────────────────────── CONSULTAR ───────────────────────────────
+
+    def classify_points(self, points):
+        """Etiqueta de cada punto (N x 2, coordenadas x, y). Fuera del frame → 0."""
+        pts = np.asarray(points, np.float64).reshape(-1, 2)
+        if not len(pts):
+            return np.zeros(0, np.uint8)
+        h, w = self.shape
+        xs = np.floor(pts[:, 0]).astype(np.int64)
+        ys = np.floor(pts[:, 1]).astype(np.int64)
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        out = np.zeros(len(pts), np.uint8)
+        out[inside] = self.labels[ys[inside], xs[inside]]
+        return out
+
+    def classify_boxes(self, boxes):
+        """Etiqueta máxima tocada por cada caja (N x 4: x, y, w, h), bordes incluidos."""
+        b = np.asarray(boxes, np.int64).reshape(-1, 4)
+        if not len(b):
+            return np.zeros(0, np.uint8)
+        h, w = self.shape
+        x1 = np.clip(b[:, 0], 0, w)
+        y1 = np.clip(b[:, 1], 0, h)
+        x2 = np.clip(b[:, 0] + b[:, 2] + 1, 0, w)
+        y2 = np.clip(b[:, 1] + b[:, 3] + 1, 0, h)
+        any_i, red_i = self._integrals
+
+        def box_sum(ii):
+            return ii[y2, x2] - ii[y1, x2] - ii[y2, x1] + ii[y1, x1]
+
+        out = np.where(box_sum(any_i) > 0, LABEL_AMBER, LABEL_NONE).astype(np.uint8)
+        out[box_sum(red_i) > 0] = LABEL_RED
+        return out
+
+    def status_for(self, labels):
+        """Estado global (SAFE/WARNING/DANGER) a partir de un array de etiquetas."""
+        return LABEL_STATUS[int(labels.max())] if len(labels) else "SAFE"